@@ -0,0 +1,261 @@
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from .harness import load_app, seed_drinks, start_issuer, summarize
+
+
+'''
+End-to-end benchmark of the coffee shop api
+    seeds --drinks drinks, serves the api from a threaded werkzeug server and
+    replays the request mix of the postman collection from --concurrency
+    client threads, with tokens minted by a LocalIssuer
+    per route it reports req/s, p50/p95/p99 latency and the auth, db and
+    serialize sections of the Server-Timing header
+    with --baseline the run fails when a route's p95 grows by more than
+    --threshold compared to the baseline results
+    USAGE (from /backend)
+        python -m benchmarks.api_bench --drinks 500 --concurrency 16 --output base.json
+        python -m benchmarks.api_bench --drinks 500 --concurrency 16 --baseline base.json
+'''
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTION = os.path.join(BACKEND_DIR, 'udacity-fsnd-udaspicelatte.postman_collection.json')
+SECTIONS = ('auth', 'db', 'serialize')
+
+
+'''
+load_collection(path)
+    returns the requests of the postman collection as
+    (role, method, path, body) tuples, the folder name being the role
+'''
+
+
+def load_collection(path=COLLECTION):
+    with open(path) as f:
+        collection = json.load(f)
+    requests = []
+    for folder in collection['item']:
+        for item in folder['item']:
+            request = item['request']
+            url = request['url']['raw'] if isinstance(request['url'], dict) else request['url']
+            raw_body = request.get('body', {}).get('raw')
+            requests.append((
+                folder['name'],
+                request['method'],
+                url.replace('{{host}}', ''),
+                json.loads(raw_body) if raw_body else None
+            ))
+    return requests
+
+
+def route_of(method, path):
+    return method + ' ' + re.sub(r'/\d+', '/<id>', path)
+
+
+def parse_server_timing(header):
+    timings = {}
+    for part in (header or '').split(','):
+        name, _, duration = part.strip().partition(';dur=')
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+'''
+RequestMix
+Turns the collection into an endless stream of concrete requests
+    created titles are made unique and PATCH/DELETE target seeded drinks,
+    each seeded drink being deleted at most once
+'''
+
+
+class RequestMix:
+    def __init__(self, collection, tokens, drink_count, seed=0):
+        self.collection = collection
+        self.tokens = tokens
+        self.drink_ids = list(range(1, drink_count + 1))
+        self.rng = random.Random(seed)
+        self.rng.shuffle(self.drink_ids)
+        self.deletable = list(self.drink_ids)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            n = next(self.counter)
+            role, method, path, body = self.collection[n % len(self.collection)]
+            if re.search(r'/\d+$', path):
+                if method == 'DELETE':
+                    drink_id = self.deletable.pop() if self.deletable else 0
+                else:
+                    drink_id = self.rng.choice(self.drink_ids) if self.drink_ids else 0
+                path = re.sub(r'/\d+$', f'/{drink_id}', path)
+        if body is not None:
+            body = dict(body)
+            if 'title' in body:
+                body['title'] = f"{body['title']} {n}"
+            if isinstance(body.get('recipe'), dict):
+                body['recipe'] = [body['recipe']]
+        headers = {'Content-Type': 'application/json'}
+        if self.tokens.get(role):
+            headers['Authorization'] = 'Bearer ' + self.tokens[role]
+        return method, path, body, headers
+
+
+def send(port, method, path, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    start = time.perf_counter()
+    connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = connection.getresponse()
+    response.read()
+    elapsed = (time.perf_counter() - start) * 1000
+    connection.close()
+    return response.status, elapsed, parse_server_timing(response.getheader('Server-Timing'))
+
+
+'''
+run(port, mix, total, concurrency)
+    sends total requests from concurrency threads and returns the samples
+    as (route, status, latency_ms, server_timings) tuples plus the wall time
+'''
+
+
+def run(port, mix, total, concurrency):
+    samples = []
+    remaining = itertools.count()
+
+    def worker():
+        while next(remaining) < total:
+            method, path, body, headers = mix.next()
+            status, elapsed, timings = send(port, method, path, body, headers)
+            samples.append((route_of(method, path), status, elapsed, timings))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def report(samples, wall_time):
+    routes = {}
+    for route, status, elapsed, timings in samples:
+        entry = routes.setdefault(route, {'status': {}, 'latency': [], 'sections': {}})
+        entry['status'][str(status)] = entry['status'].get(str(status), 0) + 1
+        entry['latency'].append(elapsed)
+        for name in SECTIONS:
+            if name in timings:
+                entry['sections'].setdefault(name, []).append(timings[name])
+
+    return {
+        'wall_time_s': round(wall_time, 3),
+        'requests': len(samples),
+        'rps': round(len(samples) / wall_time, 1),
+        'routes': {
+            route: {
+                'rps': round(len(entry['latency']) / wall_time, 1),
+                'status': entry['status'],
+                'latency_ms': summarize(entry['latency']),
+                'server_timing_ms': {
+                    name: summarize(values) for name, values in entry['sections'].items()
+                }
+            }
+            for route, entry in sorted(routes.items())
+        }
+    }
+
+
+'''
+regressions(baseline, results, threshold)
+    lists the routes whose p95 latency grew by more than threshold
+    (0.2 = 20%) compared to a previous run
+'''
+
+
+def regressions(baseline, results, threshold):
+    found = []
+    for route, previous in baseline['routes'].items():
+        current = results['routes'].get(route)
+        if not current or 'p95' not in previous['latency_ms'] or 'p95' not in current['latency_ms']:
+            continue
+        before, after = previous['latency_ms']['p95'], current['latency_ms']['p95']
+        if after > before * (1 + threshold):
+            found.append(f'{route}: p95 {before:.2f}ms -> {after:.2f}ms')
+    return found
+
+
+def print_report(results):
+    print(f"{results['requests']} requests in {results['wall_time_s']}s, {results['rps']} req/s")
+    print(f"{'route':<24}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}   auth/db/serialize p50")
+    for route, entry in results['routes'].items():
+        latency = entry['latency_ms']
+        sections = '/'.join(
+            str(entry['server_timing_ms'].get(name, {}).get('p50', '-')) for name in SECTIONS
+        )
+        print(f"{route:<24}{entry['rps']:>8}{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}   {sections}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay the postman collection against the api.')
+    parser.add_argument('--drinks', type=int, default=200, help='drinks to seed')
+    parser.add_argument('--requests', type=int, default=2000, help='requests to send')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed p95 growth over the baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    os.environ['SERVER_TIMING'] = '1'
+    issuer = start_issuer()
+    app, db = load_app()
+    seed_drinks(app, db, args.drinks)
+    tokens = {role: issuer.mint(role) for role in ('barista', 'manager')}
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    collection = load_collection()
+    mix = RequestMix(collection, tokens, args.drinks)
+    # one pass over the collection warms the key set and the token caches
+    run(server.server_port, mix, len(collection), 1)
+    samples, wall_time = run(server.server_port, mix, args.requests, args.concurrency)
+    server.shutdown()
+    issuer.stop()
+
+    results = report(samples, wall_time)
+    results['config'] = {
+        'drinks': args.drinks,
+        'requests': args.requests,
+        'concurrency': args.concurrency
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(json.load(f), results, args.threshold)
+        for line in found:
+            print('REGRESSION ' + line)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
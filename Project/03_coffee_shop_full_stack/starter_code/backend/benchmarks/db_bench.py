@@ -0,0 +1,129 @@
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+
+from .harness import load_app, random_recipe, seed_drinks, summarize
+
+
+'''
+Read and write throughput of the database with and without the SQLite tuning
+    runs --readers threads loading single drinks and pages of the listing and
+    --writers threads inserting and updating drinks for --seconds, once with
+    SQLite defaults and no connection pool (how setup_db used to connect) and
+    once with the SQLITE_PRAGMAS and pool of src/database/models.py and once
+    more with the writes going through a GroupCommitWriter
+    every operation runs in its own app context, like a request does
+    USAGE (from /backend)
+        python -m benchmarks.db_bench --drinks 2000 --readers 8 --writers 2 --seconds 5
+'''
+
+
+'''
+configure(app, pragmas, pooled)
+    points the api at a fresh SQLite file opened with pragmas, through a
+    connection pool if pooled
+'''
+
+
+def configure(app, pragmas, pooled):
+    from src.database import models
+
+    handle, path = tempfile.mkstemp(prefix='coffee-db-bench-', suffix='.db')
+    os.close(handle)
+    uri = 'sqlite:///' + path
+    models.SQLITE_PRAGMAS = pragmas
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = models.engine_options(uri) if pooled else {}
+    # a new uri makes flask-sqlalchemy build a new engine with these settings
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+
+
+def run(app, drinks, readers, writers, seconds, seed=0, group_commit=None):
+    from src.database.models import Drink
+    from src.database.writer import insert_drink, run_write, update_drink
+
+    submit = group_commit.submit if group_commit is not None else run_write
+
+    deadline = time.monotonic() + seconds
+    latencies = {'read': [], 'write': []}
+    errors = {}
+    titles = itertools.count()
+
+    def read(rng):
+        if rng.random() < 0.8:
+            drink = Drink.query.filter(Drink.id == rng.randint(1, drinks)).one_or_none()
+            if drink is not None:
+                drink.long()
+        else:
+            [drink.short() for drink in Drink.page(rng.randint(0, drinks), 50, view='short')]
+
+    def write(rng):
+        if rng.random() < 0.5:
+            submit(insert_drink, f'bench {next(titles)}', random_recipe(rng))
+        else:
+            submit(update_drink, rng.randint(1, drinks), None, random_recipe(rng))
+
+    def worker(kind, operation, seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with app.app_context():
+                    operation(rng)
+            except Exception as e:
+                name = f'{kind}: {type(e).__name__}'
+                errors[name] = errors.get(name, 0) + 1
+                continue
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=('read', read, seed + i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', write, seed + readers + i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'reads_per_s': round(len(latencies['read']) / seconds, 1),
+        'writes_per_s': round(len(latencies['write']) / seconds, 1),
+        'read_ms': summarize(latencies['read']),
+        'write_ms': summarize(latencies['write']),
+        'errors': errors
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare SQLite defaults with the tuned settings.')
+    parser.add_argument('--drinks', type=int, default=1000, help='drinks to seed')
+    parser.add_argument('--readers', type=int, default=8, help='reading threads')
+    parser.add_argument('--writers', type=int, default=2, help='writing threads')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each run')
+    parser.add_argument('--window-ms', type=float, default=2, help='group commit window')
+    args = parser.parse_args(argv)
+
+    app, db = load_app()
+    from src.database.models import SQLITE_PRAGMAS
+    from src.database.writer import GroupCommitWriter
+
+    tuned = dict(SQLITE_PRAGMAS)
+
+    print(f"{'settings':<10}{'reads/s':>10}{'p95 ms':>9}{'writes/s':>10}{'p95 ms':>9}   errors")
+    group_commit = GroupCommitWriter(app, args.window_ms / 1000)
+    runs = (
+        ('defaults', {}, False, None),
+        ('tuned', tuned, True, None),
+        ('group', tuned, True, group_commit)
+    )
+    for name, pragmas, pooled, writer in runs:
+        configure(app, pragmas, pooled)
+        seed_drinks(app, db, args.drinks)
+        result = run(app, args.drinks, args.readers, args.writers, args.seconds, group_commit=writer)
+        print(f"{name:<10}{result['reads_per_s']:>10}{result['read_ms'].get('p95', '-'):>9}"
+              f"{result['writes_per_s']:>10}{result['write_ms'].get('p95', '-'):>9}   "
+              f"{result['errors'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
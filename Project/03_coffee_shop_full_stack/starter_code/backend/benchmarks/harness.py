@@ -0,0 +1,109 @@
+import os
+import random
+import tempfile
+
+
+'''
+Shared setup for the benchmarks
+    the api is loaded against a throwaway SQLite file and a LocalIssuer,
+    so neither the checked-in database nor the Auth0 tenant is touched
+'''
+
+COLORS = ['blue', 'grey', 'brown', 'white', 'green', 'black']
+INGREDIENTS = ['water', 'milk', 'espresso', 'foam', 'matcha', 'oat milk', 'syrup']
+
+
+'''
+start_issuer(audience='dev')
+    starts a LocalIssuer and points the auth module at it
+    must run before src.api is imported, auth.py reads its settings on import
+'''
+
+
+def start_issuer(audience='dev'):
+    from src.auth.local_issuer import LocalIssuer
+
+    issuer = LocalIssuer(audience=audience).start()
+    os.environ['AUTH0_ISSUER'] = issuer.issuer
+    os.environ['API_AUDIENCE'] = audience
+    return issuer
+
+
+'''
+load_app(database_path=None)
+    imports the api bound to database_path (a fresh temporary file by default)
+    and returns (app, db)
+'''
+
+
+def load_app(database_path=None):
+    if database_path is None:
+        handle, database_path = tempfile.mkstemp(prefix='coffee-bench-', suffix='.db')
+        os.close(handle)
+    uri = 'sqlite:///' + database_path
+    # read by setup_db when src.api is imported
+    os.environ['DATABASE_URL'] = uri
+    from src.api import app
+    from src.database.models import db
+
+    # flask-sqlalchemy creates the engine on first use, so an api imported
+    # earlier can still be pointed at the new file
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    return app, db
+
+
+def random_recipe(rng):
+    return [
+        {
+            'name': rng.choice(INGREDIENTS),
+            'color': rng.choice(COLORS),
+            'parts': rng.randint(1, 4)
+        }
+        for _ in range(rng.randint(1, 3))
+    ]
+
+
+'''
+seed_drinks(app, db, count, seed=0)
+    recreates the tables and inserts count drinks with random recipes
+'''
+
+
+def seed_drinks(app, db, count, seed=0):
+    from src.database.models import Drink
+
+    rng = random.Random(seed)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([
+            Drink(title=f'drink {i}', recipe=random_recipe(rng))
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+'''
+summarize(samples)
+    returns count/mean/p50/p95/p99 of a list of durations in milliseconds
+'''
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean': round(sum(samples) / len(samples), 3),
+        'p50': round(percentile(samples, 0.50), 3),
+        'p95': round(percentile(samples, 0.95), 3),
+        'p99': round(percentile(samples, 0.99), 3)
+    }
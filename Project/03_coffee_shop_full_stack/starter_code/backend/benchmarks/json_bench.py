@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+
+from .api_bench import parse_server_timing
+from .harness import load_app, seed_drinks, start_issuer, summarize
+
+
+'''
+Share of request time spent serializing JSON, per JSON provider
+    seeds --drinks drinks and requests the full long listing (with the menu
+    cache emptied before every request, so it is serialized each time) and
+    pages of --page drinks, once per provider of src/json_provider.py that
+    is installed; reports p50 latency, the p50 of the serialize section of
+    Server-Timing and the serialize share of the request
+    USAGE (from /backend)
+        python -m benchmarks.json_bench --drinks 2000 --requests 50
+'''
+
+
+def measure(client, path, headers, requests, before=None):
+    latencies = []
+    serialize = []
+    for _ in range(requests):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+        serialize.append(parse_server_timing(response.headers.get('Server-Timing')).get('serialize', 0))
+    return summarize(latencies)['p50'], summarize(serialize)['p50']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the JSON providers inside requests.')
+    parser.add_argument('--drinks', type=int, default=2000, help='drinks to seed')
+    parser.add_argument('--page', type=int, default=100, help='drinks per page')
+    parser.add_argument('--requests', type=int, default=50, help='requests per measurement')
+    args = parser.parse_args(argv)
+
+    os.environ['SERVER_TIMING'] = '1'
+    issuer = start_issuer()
+    app, db = load_app()
+    seed_drinks(app, db, args.drinks)
+    from src import json_provider
+    from src.menu_cache import menu_cache
+
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + issuer.mint('manager')}
+    routes = (
+        ('full listing', '/drinks-detail', menu_cache.clear),
+        (f'page of {args.page}', f'/drinks-detail?limit={args.page}', None)
+    )
+
+    print(f"{'provider':<10}{'request':<16}{'p50 ms':>9}{'serialize':>11}{'share':>8}")
+    for name in json_provider.PROVIDERS:
+        try:
+            json_provider.use(name)
+        except ImportError as e:
+            print(f'{name:<10}not installed ({e})')
+            continue
+        for label, path, before in routes:
+            # one untimed request warms the token cache and the connection pool
+            client.get(path, headers=headers)
+            latency, serialize = measure(client, path, headers, args.requests, before)
+            print(f'{name:<10}{label:<16}{latency:>9.2f}{serialize:>11.2f}{serialize / latency:>8.0%}')
+    issuer.stop()
+
+
+if __name__ == '__main__':
+    main()
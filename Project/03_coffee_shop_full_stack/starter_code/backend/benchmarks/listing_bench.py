@@ -0,0 +1,72 @@
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from .harness import load_app, seed_drinks
+
+
+'''
+ORM instances versus DrinkRow records for the drink listings
+    seeds --drinks drinks and serializes the whole listing in the short and
+    long view, once from Drink instances (Drink.query_for) and once from the
+    Core fast path (Drink.rows), reporting the median latency over --repeat
+    runs and the peak traced memory of one run
+    USAGE (from /backend)
+        python -m benchmarks.listing_bench --drinks 10000 --repeat 5
+'''
+
+
+def orm_listing(view):
+    from src.database.models import Drink
+
+    return [getattr(drink, view)() for drink in Drink.query_for(view).order_by(Drink.id).all()]
+
+
+def rows_listing(view):
+    from src.database.models import Drink
+
+    return [getattr(drink, view)() for drink in Drink.rows(view)]
+
+
+def measure(app, db, listing, view, repeat):
+    latencies = []
+    for _ in range(repeat):
+        with app.app_context():
+            start = time.perf_counter()
+            listing(view)
+            latencies.append((time.perf_counter() - start) * 1000)
+            db.session.remove()
+    with app.app_context():
+        tracemalloc.start()
+        listing(view)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return statistics.median(latencies), peak / 1024 / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare ORM and Core reads of the drink listings.')
+    parser.add_argument('--drinks', type=int, default=10000, help='drinks to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per path')
+    args = parser.parse_args(argv)
+
+    app, db = load_app()
+    seed_drinks(app, db, args.drinks)
+    with app.app_context():
+        # the two listings must serialize to the same thing
+        for view in ('short', 'long'):
+            assert orm_listing(view) == rows_listing(view)
+
+    print(f"{'view':<7}{'path':<6}{'median ms':>11}{'peak MiB':>10}")
+    for view in ('short', 'long'):
+        results = {}
+        for name, listing in (('orm', orm_listing), ('rows', rows_listing)):
+            results[name] = measure(app, db, listing, view, args.repeat)
+            print(f'{view:<7}{name:<6}{results[name][0]:>11.1f}{results[name][1]:>10.2f}')
+        (orm_ms, orm_peak), (rows_ms, rows_peak) = results['orm'], results['rows']
+        print(f'{view:<7}saves {1 - rows_ms / orm_ms:.0%} time, {1 - rows_peak / orm_peak:.0%} memory')
+
+
+if __name__ == '__main__':
+    main()
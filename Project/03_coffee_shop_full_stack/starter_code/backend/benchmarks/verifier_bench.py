@@ -0,0 +1,114 @@
+import argparse
+import base64
+import json
+import time
+
+
+'''
+Tokens verified per second, per verifier backend and algorithm
+    signs --tokens tokens for each of RS256, ES256 and EdDSA and decodes them
+    with every backend of src/auth/verification.py, the way verify_decode_jwt
+    does once the key object is cached
+    signing needs the cryptography package
+    USAGE (from /backend)
+        python -m benchmarks.verifier_bench --tokens 2000
+'''
+
+ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+AUDIENCE = 'dev'
+ISSUER = 'https://bench.local/'
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def b64_uint(value, length=None):
+    return b64(value.to_bytes(length or (value.bit_length() + 7) // 8, 'big'))
+
+
+'''
+signer(algorithm)
+    returns (jwk, sign) where sign(signing_input) returns the JWS signature
+'''
+
+
+def signer(algorithm):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        numbers = private_key.public_key().public_numbers()
+        jwk = {'kty': 'RSA', 'n': b64_uint(numbers.n), 'e': b64_uint(numbers.e)}
+        return jwk, lambda data: private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+
+    if algorithm == 'ES256':
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        numbers = private_key.public_key().public_numbers()
+        jwk = {'kty': 'EC', 'crv': 'P-256', 'x': b64_uint(numbers.x, 32), 'y': b64_uint(numbers.y, 32)}
+
+        def sign(data):
+            r, s = decode_dss_signature(private_key.sign(data, ec.ECDSA(hashes.SHA256())))
+            return r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+        return jwk, sign
+
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    public_bytes = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    jwk = {'kty': 'OKP', 'crv': 'Ed25519', 'x': b64(public_bytes)}
+    return jwk, private_key.sign
+
+
+def mint(algorithm, sign, count):
+    now = int(time.time())
+    header = b64(json.dumps({'alg': algorithm, 'typ': 'JWT', 'kid': 'bench'}).encode())
+    tokens = []
+    for i in range(count):
+        payload = b64(json.dumps({
+            'iss': ISSUER, 'aud': AUDIENCE, 'sub': f'bench|{i}',
+            'iat': now, 'exp': now + 3600, 'permissions': ['get:drinks']
+        }).encode())
+        signing_input = f'{header}.{payload}'
+        tokens.append(signing_input + '.' + b64(sign(signing_input.encode('ascii'))))
+    return tokens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare JWT verifier backends.')
+    parser.add_argument('--tokens', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from src.auth.verification import VERIFIERS, decode_token, get_verifier
+
+    print(f"{'backend':<14}" + ''.join(f'{algorithm:>12}' for algorithm in ALGORITHMS))
+    keys = {algorithm: signer(algorithm) for algorithm in ALGORITHMS}
+    tokens = {algorithm: mint(algorithm, keys[algorithm][1], args.tokens) for algorithm in ALGORITHMS}
+
+    for name in VERIFIERS:
+        try:
+            verifier = get_verifier(name)
+        except ImportError as e:
+            print(f'{name:<14}not installed ({e})')
+            continue
+        row = f'{name:<14}'
+        for algorithm in ALGORITHMS:
+            jwk = dict(keys[algorithm][0], kid='bench')
+            try:
+                public_key = verifier.construct_key(jwk, algorithm)
+                decode_token(tokens[algorithm][0], jwk, public_key, [algorithm],
+                             AUDIENCE, ISSUER, verifier)
+            except Exception:
+                row += f"{'n/a':>12}"
+                continue
+            start = time.perf_counter()
+            for token in tokens[algorithm]:
+                decode_token(token, jwk, public_key, [algorithm], AUDIENCE, ISSUER, verifier)
+            row += f'{args.tokens / (time.perf_counter() - start):>10.0f}/s'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
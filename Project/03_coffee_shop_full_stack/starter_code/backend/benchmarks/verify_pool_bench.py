@@ -0,0 +1,87 @@
+import argparse
+import itertools
+import os
+import threading
+import time
+
+from .harness import start_issuer
+
+
+'''
+Inline versus process-pool token verification
+    verifies distinct tokens (so no cache can help) through
+    auth.verify_decode_jwt from an increasing number of request threads,
+    once inline and once through a VerifierPool, and reports tokens/s
+    for each and the first concurrency at which the pool wins
+    USAGE (from /backend)
+        python -m benchmarks.verify_pool_bench --processes 4 --tokens 2000
+'''
+
+
+def measure(verify, tokens, concurrency):
+    remaining = iter(tokens)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                token = next(remaining, None)
+            if token is None:
+                return
+            verify(token)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(tokens) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare inline and pooled JWT verification.')
+    parser.add_argument('--tokens', type=int, default=1000, help='tokens per measurement')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-window-ms', type=float, default=2)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32',
+                        help='comma separated numbers of request threads')
+    args = parser.parse_args(argv)
+
+    issuer = start_issuer()
+    from src.auth import auth
+    from src.auth.verification import VerifierPool
+
+    pool = VerifierPool(args.processes, args.batch_window_ms / 1000, args.max_batch)
+    counter = itertools.count()
+
+    def fresh_tokens():
+        return [issuer.mint('manager', jti=str(next(counter))) for _ in range(args.tokens)]
+
+    # warm the key set and start the worker processes
+    auth.verify_decode_jwt(issuer.mint('manager'))
+    auth.verifier_pool = pool
+    measure(auth.verify_decode_jwt, fresh_tokens()[:args.processes * 4], args.processes)
+
+    print(f"{'threads':>8}{'inline/s':>12}{'pool/s':>12}")
+    crossover = None
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        auth.verifier_pool = None
+        inline_rate = measure(auth.verify_decode_jwt, fresh_tokens(), concurrency)
+        auth.verifier_pool = pool
+        pool_rate = measure(auth.verify_decode_jwt, fresh_tokens(), concurrency)
+        print(f'{concurrency:>8}{inline_rate:>12.0f}{pool_rate:>12.0f}')
+        if crossover is None and pool_rate > inline_rate:
+            crossover = concurrency
+
+    if crossover is None:
+        print('the pool did not beat inline verification at any measured concurrency')
+    else:
+        print(f'the pool beats inline verification from {crossover} concurrent requests')
+    pool.shutdown()
+    issuer.stop()
+
+
+if __name__ == '__main__':
+    main()
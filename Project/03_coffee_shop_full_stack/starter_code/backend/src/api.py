@@ -1,44 +1,341 @@
 #from crypt import methods
 import os
-from flask import Flask, request, jsonify, abort
+import time
+import hashlib
+import base64
+import binascii
+from flask import Flask, request, abort, stream_with_context
 from sqlalchemy import exc
-import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, setup_db, upgrade_database, db, Drink, DrinkChange, Ingredient
 from .auth.auth import AuthError, get_token_auth_header, requires_auth
+from . import broadcast, compression, json_provider, timing
+from .json_provider import jsonify
+from .timing import timed
+from .menu_cache import menu_cache
+from .single_flight import SingleFlight
+from .database import bulk, writer
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+json_provider.init_app(app)
+timing.init_app(app)
+compression.init_app(app)
 
+# GROUP_COMMIT=1 sends drink mutations through one writer thread that
+# commits the writes arriving within GROUP_COMMIT_WINDOW_MS together
+GROUP_COMMIT = os.environ.get('GROUP_COMMIT', '0') == '1'
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 2))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+drink_writer = None
+if GROUP_COMMIT:
+    drink_writer = writer.GroupCommitWriter(app, GROUP_COMMIT_WINDOW_MS / 1000, GROUP_COMMIT_MAX_BATCH)
 
 
+# COALESCE_READS=0 lets every concurrent listing request do its own reads
+COALESCE_READS = os.environ.get('COALESCE_READS', '1') == '1'
+read_flights = SingleFlight() if COALESCE_READS else None
+
+
+# live menu events, see events_response(); a stream whose queue grows past
+# SSE_QUEUE_SIZE events is dropped, idle streams get a comment every
+# SSE_KEEPALIVE seconds, commits of other processes arrive within
+# SSE_POLL_INTERVAL seconds; a stream is closed after SSE_MAX_LIFETIME
+# seconds, and the client reconnects, so no stream holds a worker for good;
+# beyond SSE_MAX_SUBSCRIBERS open streams per process new ones get a 503
+SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', '256'))
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', '15'))
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', '1'))
+SSE_MAX_LIFETIME = float(os.environ.get('SSE_MAX_LIFETIME', '300'))
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', '1000'))
+event_hub = broadcast.BroadcastHub(SSE_QUEUE_SIZE, SSE_MAX_SUBSCRIBERS)
+change_feed = broadcast.ChangeFeed(app, event_hub, SSE_POLL_INTERVAL)
+
+
+'''
+coalesced(key, fn)
+    returns fn(); concurrent requests with the same key share a single call
+    keys start with the route and the view, which stands for the permission
+    tier, and hold the change log version (listing_version) and every query
+    parameter the result depends on, so a request never gets a result
+    older than its own read; where there is no version nothing is shared
+'''
+def coalesced(key, fn):
+    if read_flights is None:
+        return fn()
+    return read_flights.do(key, fn)
+
+
+'''
+write_drink(operation, *args)
+    runs a mutation of src/database/writer.py, through the group commit
+    writer when it is enabled, and returns the drink's long() representation
+'''
+def write_drink(operation, *args):
+    if drink_writer is not None:
+        return drink_writer.submit(operation, *args)
+    return writer.run_write(operation, *args)
+
+'''
+    flask upgrade-db
+        upgrades a database from before recipes were stored pre-parsed,
+        changes were logged or ingredients had their own tables, in place
+        run it once before starting the server
+'''
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    upgrade_database()
+
+
+
+'''
+listing_version()
+    the change log version (DrinkChange.current) that cached and coalesced
+    listings are keyed on; it is read from the database, so a commit of any
+    worker process makes every process's cache stale
+    None where the log is not commit ordered: its newest id then says
+    nothing about what was committed, and nothing is cached or shared
+'''
+def listing_version():
+    if not DrinkChange.commit_ordered():
+        return None
+    return DrinkChange.current()
+
+
+'''
+menu_response(view)
+    returns the listing of all drinks in the short or long view
+    the serialized body is built once per change log version and then
+    served from menu_cache until a drink is inserted, updated or deleted,
+    by any worker process (see listing_version)
+    responses carry a strong ETag; where the change log is commit ordered
+    it is the log's version (see menu_etag), so a client that is up to
+    date gets its 304 Not Modified before the cache or the listing is
+    read, otherwise it is a hash of the body, built on every request
+    the body is compressed as negotiated by compression.negotiate, each
+    encoding once per version
+    concurrent requests missing the cache share one build (coalesced)
+    the listing carries the change log version it is current to, from
+    which clients ask /drinks/changes for what changed since
+'''
+def menu_response(view):
+    def build():
+        # Query all drinks
+        with timed('db'):
+            # read before the drinks: a change committed meanwhile is at
+            # worst sent again by /drinks/changes, never skipped
+            change_version = DrinkChange.current()
+            all_drinks = list(Drink.rows(view))
+        #if all_drinks is empty throw 404
+        if not all_drinks:
+            abort(404)
+        #
+        with timed('serialize'):
+            drinks = [getattr(drink, view)() for drink in all_drinks]
+            body = json_provider.dumpb({
+                'success':True,
+                'drinks':drinks,
+                'version':change_version
+             })
+        if version is None:
+            return body, hashlib.sha256(body).hexdigest()[:32]
+        return menu_cache.set(view, change_version, body, menu_etag(view, change_version))
+
+    def compress():
+        encoder = compression.ENCODERS[encoding]
+        if version is None:
+            return encoder(body)
+        # None when another request cached a newer menu meanwhile
+        return menu_cache.variant(view, version, encoding, encoder) or encoder(body)
+
+    version = listing_version()
+    if version is not None and request.if_none_match:
+        etag = menu_etag(view, version)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            # the client holds the weak tag of a compressed body or the strong one
+            response.set_etag(etag, weak=not request.if_none_match.contains(etag))
+            response.vary.add('Accept-Encoding')
+            response.headers['Cache-Control'] = 'no-cache' if view == 'short' else 'private, no-cache'
+            return response
+    if version is None:
+        body, etag = build()
+    else:
+        # a burst of requests on a cold cache builds the body once
+        cached = menu_cache.get(view, version) or coalesced(('menu', view, version), build)
+        body, etag = cached
+    encoding = compression.negotiate(request, len(body))
+    if encoding is not None:
+        with timed('compress'):
+            body = compress() if version is None else coalesced(('menu', view, version, encoding), compress)
+    response = app.response_class(mimetype='application/json')
+    response.set_etag(etag)
+    compression.encode(response, body, encoding)
+    # clients may keep the menu but have to revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache' if view == 'short' else 'private, no-cache'
+    return response.make_conditional(request)
+
+
+'''
+menu_etag(view, change_version)
+    the ETag of the listing of view at change_version, the same in every
+    worker process and across restarts
+'''
+def menu_etag(view, change_version):
+    return f'{view}-{change_version}'
+
+
+# most drinks a single page of a listing may hold
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '100'))
+
+
+'''
+encode_cursor(drink_id) / decode_cursor(cursor)
+    the cursor handed to clients is opaque: the id of the last drink on the
+    page, base64 encoded so nobody is tempted to build one by hand
+'''
+def encode_cursor(drink_id):
+    return base64.urlsafe_b64encode(str(drink_id).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii'))
+
+
+'''
+page_params()
+    reads ?limit=, ?cursor=, ?title= (a title prefix) and ?ingredient= (an
+    ingredient name) of a listing request
+    returns (after, limit, title_prefix, ingredient), or None when none of
+    them is given
+    so the full menu is served exactly as before
+    aborts with 400 on a malformed limit or cursor
+'''
+def page_params():
+    args = request.args
+    if not any(name in args for name in ('limit', 'cursor', 'title', 'ingredient')):
+        return None
+    try:
+        limit = int(args.get('limit', MAX_PAGE_SIZE))
+        after = decode_cursor(args['cursor']) if args.get('cursor') else 0
+    except (ValueError, binascii.Error):
+        abort(400)
+    if limit < 1 or after < 0:
+        abort(400)
+    return after, min(limit, MAX_PAGE_SIZE), args.get('title') or None, args.get('ingredient') or None
+
+
+'''
+stream_param()
+    reads ?stream=: None without it, False for ?stream=1 and True for
+    ?stream=ndjson; aborts with 400 on any other value
+'''
+def stream_param():
+    stream = request.args.get('stream')
+    if stream is None:
+        return None
+    if stream not in ('1', 'ndjson'):
+        abort(400)
+    return stream == 'ndjson'
+
+
+'''
+page_response(view, after, limit, title_prefix, ingredient)
+    returns one page of the listing in the short or long view
+    the envelope is the one of the full listing plus "next", the cursor of
+    the following page or null on the last one; an empty page is not a 404
+    identical pages requested concurrently are read once (coalesced)
+'''
+def page_response(view, after, limit, title_prefix, ingredient):
+    def build():
+        with timed('db'):
+            # one extra row tells whether another page follows
+            drinks = list(Drink.rows(view, after, limit + 1, title_prefix, ingredient))
+        next_cursor = encode_cursor(drinks[limit - 1].id) if len(drinks) > limit else None
+        with timed('serialize'):
+            return json_provider.dumpb({
+                'success':True,
+                'drinks':[getattr(drink, view)() for drink in drinks[:limit]],
+                'next':next_cursor
+            }) + b'\n'
+
+    version = listing_version()
+    key = ('page', view, version, after, limit, title_prefix, ingredient)
+    response = app.response_class(build() if version is None else coalesced(key, build), mimetype='application/json')
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache' if view == 'short' else 'private, no-cache'
+    return response.make_conditional(request)
+
+
+# rows fetched from the database, and written to the client, per batch
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '500'))
+
+
+'''
+stream_response(view, ndjson=False)
+    returns every drink in the short or long view without holding the menu
+    in memory: the query is read in batches of STREAM_BATCH_SIZE rows
+    (Drink.rows) and each batch is written to the client as soon as it is
+    serialized
+    the body is the usual {"success": true, "drinks": [...]} document, or
+    with ndjson one drink per line (application/x-ndjson)
+'''
+def stream_response(view, ndjson=False):
+    def write(batch, written):
+        if ndjson:
+            return ''.join(line + '\n' for line in batch)
+        return (',' if written else '') + ','.join(batch)
+
+    def generate():
+        if not ndjson:
+            yield '{"success": true, "drinks": ['
+        batch = []
+        written = 0
+        for drink in Drink.rows(view, batch_size=STREAM_BATCH_SIZE):
+            batch.append(json_provider.dumps(getattr(drink, view)()))
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield write(batch, written)
+                written += len(batch)
+                batch = []
+        if batch:
+            yield write(batch, written)
+        if not ndjson:
+            yield ']}'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    response = app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache' if view == 'short' else 'private, no-cache'
+    return response
+
 # ROUTES
 '''
 implement endpoint
     GET /drinks
         it should be a public endpoint
         it should contain only the drink.short() data representation
-    returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
-        or appropriate status code indicating reason for failure
+    returns status code 200 and json {"success": True, "drinks": drinks, "version": version} where drinks is the list of drinks
+        and version the sync version to pass to /drinks/changes, or appropriate status code indicating reason for failure
+    ?limit=, ?cursor=, ?title= and ?ingredient= return one page of drinks instead, see page_params()
+    ?stream=1 (or ?stream=ndjson) streams the whole listing, see stream_response(); it takes no page parameters
 
 '''
 
 @app.route('/drinks',methods = ['GET'])
 def get_drinks():
+    page = page_params()
+    ndjson = stream_param()
+    if ndjson is not None and page is not None:
+        # a stream is always the whole listing
+        abort(400)
     try:
-        # Query all drinks
-        all_drinks = Drink.query.all()
-        #if all_drinks is empty throw 404
-        if not all_drinks:
-            abort(404)
-        #
-        drinks = [drink.short() for drink in all_drinks]
-        return jsonify({
-            'success':True,
-            'drinks':drinks
-         })
+        if ndjson is not None:
+            return stream_response('short', ndjson)
+        if page is not None:
+            return page_response('short', *page)
+        return menu_response('short')
     except:
         abort(422)
 '''
@@ -46,27 +343,177 @@ implement endpoint
     GET /drinks-detail
         it should require the 'get:drinks-detail' permission
         it should contain the drink.long() data representation
-    returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
-        or appropriate status code indicating reason for failure
+    returns status code 200 and json {"success": True, "drinks": drinks, "version": version} where drinks is the list of drinks
+        and version the sync version to pass to /drinks/changes, or appropriate status code indicating reason for failure
+    ?limit=, ?cursor=, ?title= and ?ingredient= return one page of drinks instead, see page_params()
+    ?stream=1 (or ?stream=ndjson) streams the whole listing, see stream_response(); it takes no page parameters
 '''
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
 def get_drinks_detail(payload):
+   page = page_params()
+   ndjson = stream_param()
+   if ndjson is not None and page is not None:
+       # a stream is always the whole listing
+       abort(400)
    try:
-        # Query all drinks
-        all_drinks = Drink.query.all()
-        #if all_drinks is empty throw 404
-        if not all_drinks:
-            abort(404)
-        #
-        drinks = [drink.long() for drink in all_drinks]
-        return jsonify({
-            'success':True,
-            'drinks':drinks
-         })
+        if ndjson is not None:
+            return stream_response('long', ndjson)
+        if page is not None:
+            return page_response('long', *page)
+        return menu_response('long')
    except:
         abort(422)
 
+'''
+changes_response(view)
+    returns the drinks inserted or updated (as "upserted") and the ids of
+    those deleted since the sync version given as ?since=, in the short or long view, with the version
+    to ask from next time; aborts with 400 without a valid ?since=
+    once the changes after since have been compacted away (or since is
+    ahead of the log, or the database cannot order them) it returns {"success": True, "resync": True, "version": version}:
+    the client downloads the full listing and asks for changes from version
+'''
+def changes_response(view):
+    since = request.args.get('since', '')
+    if not since.isdigit():
+        abort(400)
+    try:
+        with timed('db'):
+            version, drinks, deleted = DrinkChange.since(int(since), view)
+        if drinks is None:
+            response = jsonify({
+                'success':True,
+                'resync':True,
+                'version':version
+            })
+        else:
+            with timed('serialize'):
+                response = jsonify({
+                    'success':True,
+                    'resync':False,
+                    'version':version,
+                    'upserted':[getattr(drink, view)() for drink in drinks],
+                    'deleted':deleted
+                })
+    except:
+        abort(422)
+    response.headers['Cache-Control'] = 'no-cache' if view == 'short' else 'private, no-cache'
+    return response
+
+'''
+    GET /drinks/changes?since=<version>
+        it should be a public endpoint
+        it should contain only the drink.short() data representation
+    GET /drinks-detail/changes?since=<version>
+        it should require the 'get:drinks-detail' permission
+        it should contain the drink.long() data representation
+    returns status code 200 and json {"success": True, "resync": False, "version": version, "upserted": drinks, "deleted": ids}
+        or json {"success": True, "resync": True, "version": version}, see changes_response()
+        or appropriate status code indicating reason for failure
+'''
+@app.route('/drinks/changes', methods=['GET'])
+def get_drink_changes():
+    return changes_response('short')
+
+@app.route('/drinks-detail/changes', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def get_drink_detail_changes(payload):
+    return changes_response('long')
+
+'''
+events_response(view, payload=None)
+    returns a text/event-stream of the insert, update and delete events of
+    the drinks in the short or long view, as they commit
+    each event's id is its change version; with a Last-Event-ID header (or
+    ?since=) the changes after it are replayed from the change log first,
+    or a resync event is sent when they were compacted away; without it the
+    stream opens with a version event
+    the stream ends after SSE_MAX_LIFETIME seconds, when the token in
+    payload expires and when the client reads too slowly (see
+    BroadcastHub), clients reconnect with Last-Event-ID after the retry
+    delay the stream opens with; with SSE_MAX_SUBSCRIBERS streams open it
+    returns 503 and a Retry-After instead
+'''
+def events_response(view, payload=None):
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if last_id is not None and not last_id.isdigit():
+        abort(400)
+    ends_at = time.time() + SSE_MAX_LIFETIME
+    if payload and payload.get('exp'):
+        ends_at = min(ends_at, payload['exp'])
+    change_feed.start()
+    subscriber, version = event_hub.subscribe(view)
+    if subscriber is None:
+        response = jsonify({
+            'success':False,
+            'error':503,
+            'message':'too many open streams'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(SSE_KEEPALIVE))
+        return response
+
+    def replay():
+        if last_id is None:
+            yield broadcast.format_event(version, 'version', {'version':version})
+            return
+        after = int(last_id)
+        oldest, current = DrinkChange.bounds()
+        if not DrinkChange.complete_after(after, oldest, max(current, version)):
+            yield broadcast.format_event(version, 'resync', {'version':version})
+            return
+        while after < version:
+            rows = DrinkChange.events(after, version)
+            if not rows:
+                break
+            after = rows[-1][0]
+            yield ''.join(broadcast.change_events(rows, (view,))[view])
+
+    def generate():
+        try:
+            yield f'retry: {int(SSE_POLL_INTERVAL * 1000) + 1000}\n\n'
+            yield from replay()
+            # the stream holds no connection while it waits
+            db.session.close()
+            while not subscriber.dropped:
+                timeout = min(SSE_KEEPALIVE, ends_at - time.time())
+                if timeout <= 0:
+                    return
+                events = subscriber.get(timeout)
+                yield ''.join(events) if events else ': keepalive\n\n'
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    # a HEAD request, or a client gone before the first event, never runs
+    # generate() and its finally
+    response.call_on_close(lambda: event_hub.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    # proxies such as nginx must pass events on as they come
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+'''
+    GET /drinks/stream
+        it should be a public endpoint
+        it should contain only the drink.short() data representation
+    GET /drinks-detail/stream
+        it should require the 'get:drinks-detail' permission
+        it should contain the drink.long() data representation
+    returns status code 200 and a text/event-stream of insert and update events whose data is the drink,
+        delete events whose data is {"id": id} and version and resync events whose data is {"version": version}
+        or appropriate status code indicating reason for failure
+'''
+@app.route('/drinks/stream', methods=['GET'])
+def get_drink_stream():
+    return events_response('short')
+
+@app.route('/drinks-detail/stream', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def get_drink_detail_stream(payload):
+    return events_response('long', payload)
+
 '''
 implement endpoint
     POST /drinks
@@ -85,17 +532,18 @@ def add_drinks(payload):
 
     if not title and recipe:
         abort(403)
-    recipe_json = json.dumps(recipe)
     try:
-        drink = Drink(title = title, recipe = recipe_json)
-        drink.insert()
+        # the recipe is validated, and a single ingredient wrapped in a list, by Drink
+        with timed('db'):
+            drink = write_drink(writer.insert_drink, title, recipe)
     except:
         abort(422)   
   
-    return jsonify({
-        'success':True,
-        'recipe':drink.long(),
-    })
+    with timed('serialize'):
+        return jsonify({
+            'success':True,
+            'recipe':drink,
+        })
     
 '''
     PATCH /drinks/<id>
@@ -116,15 +564,14 @@ def update_drinks(payload,drink_id):
     recipe = request_body.get('recipe',None)
     if not title and recipe:
         abort(403)
-    recipe_json = json.dumps(recipe)
     try:
-        drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
-        drink.title = title,
-        drink.recipe = recipe_json
-        updated_drinks = [drink.long()]
+        # commits and bumps the menu version of the cached listings
+        with timed('db'):
+            drink = write_drink(writer.update_drink, drink_id, title, recipe)
+        updated_drinks = [drink]
         return jsonify({
             'success':True,
-            'drinks':update_drinks
+            'drinks':updated_drinks
         })  
     except:
         abort(422)     
@@ -142,17 +589,111 @@ def update_drinks(payload,drink_id):
 @requires_auth('delete:drinks' )
 def delete_drink(payload,drink_id):
     try:
-        drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
-        if not drink:
-            abort(404) 
-        drink.delete()
+        # a missing drink raises LookupError
+        with timed('db'):
+            drink = write_drink(writer.delete_drink, drink_id)
+        return jsonify({
+            'success':True,
+            'delete':drink['id']
+        })
+    except:
+        abort(422)
+
+'''
+    GET /ingredients
+        it should require the 'get:drinks-detail' permission
+    returns status code 200 and json {"success": True, "ingredients": ingredients}
+        where ingredients lists {"name": name, "drinks": count} by number of drinks using each
+        or appropriate status code indicating reason for failure
+'''
+@app.route('/ingredients', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def get_ingredients(payload):
+    try:
+        with timed('db'):
+            version = listing_version()
+            if version is None:
+                counts = Ingredient.usage_counts()
+            else:
+                counts = coalesced(('ingredients', version), Ingredient.usage_counts)
         return jsonify({
             'success':True,
-            'delete':drink.id
+            'ingredients':[{'name':name, 'drinks':drinks} for name, drinks in counts]
         })
     except:
         abort(422)
 
+'''
+    POST /drinks/bulk
+        it should require the 'post:drinks' permission
+        takes json {"drinks": [{"title": title, "recipe": recipe}, ...]}
+    PATCH /drinks/bulk
+        it should require the 'patch:drinks' permission
+        takes json {"drinks": [{"id": id, "title": title, "recipe": recipe}, ...]}, title and recipe being optional
+    DELETE /drinks/bulk
+        it should require the 'delete:drinks' permission
+        takes json {"ids": [id, ...]}
+    the whole batch is validated before anything is written and is then written in one transaction
+    returns status code 200 and json {"success": True, "drinks": drinks} (or {"success": True, "delete": ids})
+        with one entry per item in request order
+        or status code 422 and json {"success": False, "error": 422, "message": "unprocessable", "errors": errors}
+        where errors lists {"index": index, "message": message} per rejected item, nothing being written
+'''
+def bulk_response(validate, write, items, key):
+    try:
+        with timed('db'):
+            result = write(validate(items))
+    except bulk.BulkError as e:
+        return jsonify({
+            "success": False,
+            "error": 422,
+            "message": "unprocessable",
+            "errors": e.errors
+        }), 422
+    except:
+        abort(422)
+    with timed('serialize'):
+        return jsonify({
+            'success':True,
+            key:result
+        })
+
+@app.route('/drinks/bulk', methods=['POST'])
+@requires_auth('post:drinks')
+def add_drinks_bulk(payload):
+    request_body = request.get_json(silent=True) or {}
+    return bulk_response(bulk.validate_creates, bulk.create_drinks, request_body.get('drinks'), 'drinks')
+
+@app.route('/drinks/bulk', methods=['PATCH'])
+@requires_auth('patch:drinks')
+def update_drinks_bulk(payload):
+    request_body = request.get_json(silent=True) or {}
+    return bulk_response(bulk.validate_updates, bulk.update_drinks, request_body.get('drinks'), 'drinks')
+
+@app.route('/drinks/bulk', methods=['DELETE'])
+@requires_auth('delete:drinks')
+def delete_drinks_bulk(payload):
+    request_body = request.get_json(silent=True) or {}
+    return bulk_response(bulk.validate_deletes, bulk.delete_drinks, request_body.get('ids'), 'delete')
+
+'''
+    GET /metrics
+        it should require the 'get:drinks-detail' permission
+    returns status code 200 and json {"success": True, "coalescing": stats, "menu_cache": stats, "group_commit": stats, "events": stats}
+        where coalescing counts the reads run (leaders) and shared (followers), see SingleFlight.stats()
+        and group_commit is null unless GROUP_COMMIT is on
+'''
+@app.route('/metrics', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def get_metrics(payload):
+    return jsonify({
+        'success':True,
+        'coalescing':read_flights.stats() if read_flights is not None else None,
+        'menu_cache':menu_cache.stats(),
+        'group_commit':drink_writer.stats() if drink_writer is not None else None,
+        'events':event_hub.stats()
+    })
+
 # Error Handling
 
 @app.errorhandler(422)
@@ -163,6 +704,14 @@ def unprocessable(error):
         "message": "unprocessable"
     }), 422
 
+@app.errorhandler(400)
+def invalid_request(error):
+    return jsonify({
+        "success": False,
+        "error": 400,
+        "message": "invalid request"
+    }), 400
+
 '''
 @TODO implement error handler for 404
     error handler should conform to general task above
@@ -1,13 +1,71 @@
-import json
+import os
+import time
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
 
+from ..timing import timed
+from .jwks import JWKSCache
+from .permissions import permission_registry
+from .token_cache import TokenCache
+from .verification import VerifierPool, VerifierUnavailable, allowed_algorithm, decode_token, get_verifier
 
-AUTH0_DOMAIN = 'dev-k32g9c32.us.auth0.com'
-ALGORITHMS = ['RS256']
-API_AUDIENCE = 'dev'
+
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'dev-k32g9c32.us.auth0.com')
+ALGORITHMS = os.environ.get('JWT_ALGORITHMS', 'RS256').split(',')
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'dev')
+# the issuer and its key set default to the Auth0 tenant; set AUTH0_ISSUER to
+# the url printed by local_issuer.py to run and benchmark auth offline
+AUTH0_ISSUER = os.environ.get('AUTH0_ISSUER', 'https://' + AUTH0_DOMAIN + '/')
+JWKS_URL = os.environ.get('JWKS_URL', AUTH0_ISSUER + '.well-known/jwks.json')
+# upper bound in seconds on how long the issuer's key set is reused
+JWKS_CACHE_TTL = int(os.environ.get('JWKS_CACHE_TTL', 600))
+# renew the key set in a background thread this many seconds before it expires
+JWKS_REFRESH_AHEAD = int(os.environ.get('JWKS_REFRESH_AHEAD', 60))
+JWKS_BACKGROUND_REFRESH = os.environ.get('JWKS_BACKGROUND_REFRESH', '1') == '1'
+
+# signature verification backend, see verification.VERIFIERS
+# ('cryptography' needs the optional cryptography package)
+JWT_VERIFIER = os.environ.get('JWT_VERIFIER', 'jose')
+
+verifier = get_verifier(JWT_VERIFIER)
+
+jwks_cache = JWKSCache(
+    JWKS_URL,
+    ttl=JWKS_CACHE_TTL,
+    refresh_ahead=JWKS_REFRESH_AHEAD,
+    background=JWKS_BACKGROUND_REFRESH,
+    construct_key=verifier.construct_key
+)
+
+# verified tokens are reused until their exp, but never longer than TOKEN_CACHE_TTL
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE, max_ttl=TOKEN_CACHE_TTL)
+
+# recently rejected tokens are refused without verifying them again
+REJECTED_TOKEN_CACHE_SIZE = int(os.environ.get('REJECTED_TOKEN_CACHE_SIZE', 4096))
+REJECTED_TOKEN_CACHE_TTL = int(os.environ.get('REJECTED_TOKEN_CACHE_TTL', 10))
+
+rejected_tokens = TokenCache(max_size=REJECTED_TOKEN_CACHE_SIZE, max_ttl=REJECTED_TOKEN_CACHE_TTL)
+
+# with JWT_VERIFY_PROCESSES > 0 signatures are verified in a pool of worker
+# processes, batching the tokens that arrive within the batch window
+JWT_VERIFY_PROCESSES = int(os.environ.get('JWT_VERIFY_PROCESSES', 0))
+JWT_VERIFY_BATCH_WINDOW_MS = float(os.environ.get('JWT_VERIFY_BATCH_WINDOW_MS', 2))
+JWT_VERIFY_MAX_BATCH = int(os.environ.get('JWT_VERIFY_MAX_BATCH', 64))
+# a request waits this long for a worker before it is answered with a 503
+JWT_VERIFY_TIMEOUT = float(os.environ.get('JWT_VERIFY_TIMEOUT', 5))
+
+verifier_pool = None
+if JWT_VERIFY_PROCESSES > 0:
+    verifier_pool = VerifierPool(
+        processes=JWT_VERIFY_PROCESSES,
+        batch_window=JWT_VERIFY_BATCH_WINDOW_MS / 1000,
+        max_batch=JWT_VERIFY_MAX_BATCH,
+        timeout=JWT_VERIFY_TIMEOUT
+    )
 
 ## AuthError Exception
 '''
@@ -49,52 +107,84 @@ def get_token_auth_header():
 
 
 def check_permissions(permission, payload):
-    if 'permissions' in payload:
-        if permission in payload['permissions']:
-            return True
+    required = permission_registry.register([permission])
+    return check_permission_mask(permission_registry.compile(payload), required)
+
+'''
+check_permission_mask(granted, all_of, any_of=0)
+    granted is the compiled permission mask of a token
+    it must contain every bit of all_of and, if any_of is set, one of its bits
+'''
+def check_permission_mask(granted, all_of, any_of=0):
+    if granted & all_of == all_of and (not any_of or granted & any_of):
+        return True
     raise AuthError({
-        'message':'Permission not found',
-        'error':401
-    },401)
+        'code': 'unauthorized',
+        'description': 'Permission not found.'
+    }, 401)
+
+'''
+precheck_claims(token)
+    cheaply rejects tokens that verify_decode_jwt would refuse anyway,
+    judging by their unverified claims: malformed, expired, or issued for
+    another audience or by another issuer
+    it never accepts a token, the signature still has to be verified
+'''
+def precheck_claims(token):
+    try:
+        claims = jwt.get_unverified_claims(token)
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
+
+    exp = claims.get('exp')
+    if isinstance(exp, (int, float)) and exp < time.time():
+        raise AuthError({
+            'code': 'token_expired',
+            'description': 'The token has expired .'
+        }, 401)
+
+    aud = claims.get('aud')
+    audiences = aud if isinstance(aud, list) else [aud]
+    iss = claims.get('iss')
+    if (aud is not None and API_AUDIENCE not in audiences) or \
+            (iss is not None and iss != AUTH0_ISSUER):
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Invalid claims.Check the audience and issuer.'
+        }, 401)
 
 ## verifying the Header token
 def verify_decode_jwt(token):
-    # GET THE PUBLIC KEY FROM AUTH0
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    
     # GET THE DATA IN THE HEADER
     unverified_header = jwt.get_unverified_header(token)
     
     # SELETE YOUR KEY
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization header is malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    # GET THE PUBLIC KEY FROM AUTH0 (cached, see jwks.py)
+    rsa_key = jwks_cache.get(unverified_header['kid'])
     
     #verify!!!
     if rsa_key:
         try:
             # USE THE KEY TO VALIDATE THE JWT
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=ALGORITHMS,
-                audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
-            )
+            # the signature is checked with the cached key object, jose
+            # then only has to validate the claims
+            if verifier_pool is not None:
+                payload = verifier_pool.decode(token, rsa_key, ALGORITHMS, API_AUDIENCE,
+                                               AUTH0_ISSUER, verifier.name)
+            else:
+                algorithm = allowed_algorithm(token, ALGORITHMS)
+                public_key = jwks_cache.key_object(rsa_key, algorithm)
+                payload = decode_token(token, rsa_key, public_key, ALGORITHMS, API_AUDIENCE,
+                                       AUTH0_ISSUER, verifier)
 
             return payload
 
@@ -109,6 +199,11 @@ def verify_decode_jwt(token):
                 'code': 'invalid_claims',
                 'description': 'Invalid claims.Check the audience and issuer.'
             }, 401)
+        except VerifierUnavailable:
+            raise AuthError({
+                'code': 'verifier_unavailable',
+                'description': 'The token could not be verified, try again.'
+            }, 503)
         except Exception:
             raise AuthError({
                 'code': 'invalid_header',
@@ -123,19 +218,49 @@ def verify_decode_jwt(token):
 
     @INPUTS
         permission: string permission (i.e. 'post:drink')
+        all_of: permissions that are all required
+        any_of: permissions of which at least one is required
 
     it should use the get_token_auth_header method to get the token
     it should use the verify_decode_jwt method to decode the jwt
     it should use the check_permissions method validate claims and check the requested permission
     return the decorator which passes the decoded payload to the decorated method
+    tokens that were already verified are served from token_cache and
+    tokens that were just rejected are refused from rejected_tokens
+    the required permissions are resolved into bit masks once, when the
+    route is decorated, and the token's mask is cached next to its payload
 '''
-def requires_auth(permission=''):
+def requires_auth(permission='', all_of=(), any_of=()):
+    if permission or not (all_of or any_of):
+        all_of = (permission,) + tuple(all_of)
+    required_all = permission_registry.register(all_of)
+    required_any = permission_registry.register(any_of)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            with timed('auth'):
+                token = get_token_auth_header()
+                cache_key = TokenCache.key(token)
+                cached = token_cache.get(cache_key)
+                if cached is None:
+                    rejection = rejected_tokens.get(cache_key)
+                    if rejection is not None:
+                        raise AuthError(*rejection)
+                    try:
+                        precheck_claims(token)
+                        payload = verify_decode_jwt(token)
+                    except AuthError as e:
+                        # a 503 says nothing about the token, it is tried again
+                        if e.status_code != 503:
+                            rejected_tokens.set(cache_key, (e.error, e.status_code))
+                        raise
+                    cached = (payload, permission_registry.compile(payload), permission_registry.version)
+                    token_cache.set(cache_key, cached, payload.get('exp'))
+                payload, granted, version = cached
+                if version != permission_registry.version:
+                    granted = permission_registry.compile(payload)
+                check_permission_mask(granted, required_all, required_any)
             return f(payload, *args, **kwargs)
 
         return wrapper
@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import threading
+import time
+from jose import jwk
+from urllib.request import urlopen
+
+
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+# the members of a published key that identify its public half, per key type
+PUBLIC_FIELDS = {
+    'RSA': ('n', 'e'),
+    'EC': ('crv', 'x', 'y'),
+    'OKP': ('crv', 'x')
+}
+
+
+'''
+cache_lifetime(cache_control, ttl)
+    returns how many seconds a JWKS response may be served from cache
+    the Cache-Control max-age of the response is honoured but never
+    allowed to exceed the configured ttl
+'''
+
+
+def cache_lifetime(cache_control, ttl):
+    cache_control = (cache_control or '').lower()
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        return min(int(match.group(1)), ttl)
+    return ttl
+
+
+'''
+key_fingerprint(key)
+    returns (kid, *public members) of a published key, e.g. (kid, n, e)
+'''
+
+
+def key_fingerprint(key):
+    return (key['kid'],) + tuple(key.get(field) for field in PUBLIC_FIELDS.get(key['kty'], ()))
+
+
+'''
+JWKSCache
+A process-wide store of the issuer's signing keys
+    keys are indexed by kid so selecting the key of a token is a dict lookup
+    a background thread renews the key set refresh_ahead seconds before it
+    expires; if the issuer is slow or down the last good set keeps being served
+    concurrent refreshes are single-flight: one thread calls the issuer and
+    the others wait for its result
+    a token with an unknown kid triggers at most one refresh every
+    min_refresh_interval seconds, so key rotation is picked up immediately
+    without letting made-up kids hammer the issuer
+    constructed public key objects are kept by kid and public numbers
+    ((kid, n, e) for RSA) and dropped when the issuer stops publishing that key
+    construct_key builds them, jwk.construct unless a verifier backend
+    brings its own
+    EXAMPLE
+        jwks = JWKSCache('https://tenant.auth0.com/.well-known/jwks.json')
+        rsa_key = jwks.get(unverified_header['kid'])
+        public_key = jwks.key_object(rsa_key, 'RS256')
+'''
+
+
+class JWKSCache:
+    def __init__(self, url, ttl=600, timeout=5, refresh_ahead=60,
+                 min_refresh_interval=10, retry_interval=15, background=True,
+                 construct_key=jwk.construct):
+        self.url = url
+        self.construct_key = construct_key
+        self.ttl = ttl
+        self.timeout = timeout
+        self.refresh_ahead = refresh_ahead
+        self.min_refresh_interval = min_refresh_interval
+        self.retry_interval = retry_interval
+        self.background = background
+        self.keys = {}
+        self.key_objects = {}
+        self.expires_at = 0
+        self.last_refresh = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._refresher = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+
+    '''
+    fetch()
+        downloads the key set and returns (keys, lifetime)
+        where keys maps each kid to the key dict used by jwt.decode
+        (kty, kid, use and the public members of the key type)
+    '''
+
+    def fetch(self):
+        response = urlopen(self.url, timeout=self.timeout)
+        jwks = json.loads(response.read())
+        keys = {}
+        for key in jwks['keys']:
+            if 'kid' not in key or key.get('kty') not in PUBLIC_FIELDS:
+                continue
+            keys[key['kid']] = dict(
+                {'kty': key['kty'], 'kid': key['kid'], 'use': key.get('use')},
+                **{field: key[field] for field in PUBLIC_FIELDS[key['kty']]}
+            )
+        lifetime = cache_lifetime(response.headers.get('Cache-Control'), self.ttl)
+        return keys, lifetime
+
+    '''
+    refresh()
+        replaces the cached key set with a freshly fetched one
+        if a refresh is already running the caller waits for it instead
+        a failed fetch keeps the previous key set and is retried after
+        retry_interval; it only raises when there is nothing to fall back on
+    '''
+
+    def refresh(self):
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                self._inflight = threading.Event()
+
+        if inflight is not None:
+            inflight.wait(self.timeout + 1)
+            if not self.keys and self.last_error is not None:
+                raise self.last_error
+            return
+
+        try:
+            keys, lifetime = self.fetch()
+            self.keys = keys
+            self.evict_key_objects()
+            self.expires_at = time.monotonic() + lifetime
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            self.expires_at = time.monotonic() + self.retry_interval
+            if not self.keys:
+                raise
+        finally:
+            self.last_refresh = time.monotonic()
+            with self._lock:
+                inflight, self._inflight = self._inflight, None
+            inflight.set()
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires_at
+
+    '''
+    get(kid)
+        returns the rsa_key dict for kid or None if the issuer has no such key
+        an expired key set is served stale while the refresher renews it
+    '''
+
+    def get(self, kid):
+        if self.background:
+            self.start_refresher()
+
+        if not self.keys or (not self.background and not self.is_fresh()):
+            self.refresh()
+
+        key = self.keys.get(kid)
+        if key is None and time.monotonic() - self.last_refresh >= self.min_refresh_interval:
+            # the issuer may have rotated its keys since the last fetch
+            self.refresh()
+            key = self.keys.get(kid)
+        return key
+
+    '''
+    key_object(rsa_key, algorithm)
+        returns the public key behind an rsa_key dict as a ready to use jose Key
+        parsing the modulus and exponent is done once per published key
+        instead of once per request
+    '''
+
+    def key_object(self, rsa_key, algorithm):
+        cache_key = key_fingerprint(rsa_key) + (algorithm,)
+        key = self.key_objects.get(cache_key)
+        if key is None:
+            key = self.construct_key(rsa_key, algorithm)
+            self.key_objects[cache_key] = key
+        return key
+
+    '''
+    evict_key_objects()
+        forgets the key objects of keys that are no longer in the key set
+    '''
+
+    def evict_key_objects(self):
+        self.key_objects = {
+            cache_key: key
+            for cache_key, key in self.key_objects.items()
+            if cache_key[0] in self.keys
+            and key_fingerprint(self.keys[cache_key[0]]) == cache_key[:-1]
+        }
+
+    '''
+    start_refresher()
+        starts the background refresh thread once per process
+        it is started lazily so that forked workers each get their own
+    '''
+
+    def start_refresher(self):
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._run_refresher,
+                name='jwks-refresher',
+                daemon=True
+            )
+            self._refresher_pid = os.getpid()
+            self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+        self._refresher_pid = None
+
+    def _run_refresher(self):
+        while not self._stop.is_set():
+            delay = self.expires_at - self.refresh_ahead - time.monotonic()
+            if self._stop.wait(max(delay, self.min_refresh_interval)):
+                return
+            try:
+                self.refresh()
+            except Exception:
+                # nothing cached yet; get() retries inline on the next request
+                pass
+
+    def clear(self):
+        with self._lock:
+            self.keys = {}
+            self.key_objects = {}
+            self.expires_at = 0
+            self.last_refresh = 0
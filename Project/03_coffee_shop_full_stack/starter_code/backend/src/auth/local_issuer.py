@@ -0,0 +1,188 @@
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+
+'''
+A local stand-in for the Auth0 tenant
+    it generates an RSA key pair, serves the public half as
+    /.well-known/jwks.json on localhost and mints RS256 access tokens for the
+    roles of udacity-fsnd-udaspicelatte.postman_collection.json
+    point the api at it through the environment:
+        export AUTH0_ISSUER=http://127.0.0.1:8765/
+    USAGE
+        python -m src.auth.local_issuer --port 8765 --key-file issuer.pem serve
+        python -m src.auth.local_issuer --port 8765 --key-file issuer.pem token manager
+'''
+
+# mirrors the folders of the postman collection
+ROLES = {
+    'public': [],
+    'barista': ['get:drinks', 'get:drinks-detail'],
+    'manager': [
+        'get:drinks',
+        'get:drinks-detail',
+        'post:drinks',
+        'patch:drinks',
+        'delete:drinks'
+    ]
+}
+
+
+def b64_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+'''
+LocalIssuer
+An in-process token issuer with its own JWKS endpoint
+    EXAMPLE
+        issuer = LocalIssuer(audience='dev').start()
+        os.environ['AUTH0_ISSUER'] = issuer.issuer
+        token = issuer.mint('barista')
+        ...
+        issuer.stop()
+'''
+
+
+class LocalIssuer:
+    def __init__(self, host='127.0.0.1', port=0, audience='dev', key=None, kid='local-1'):
+        self.host = host
+        self.port = port
+        self.audience = audience
+        self.key = key or RSA.generate(2048)
+        self.kid = kid
+        self.private_pem = self.key.exportKey('PEM').decode('ascii')
+        self._server = None
+
+    @property
+    def issuer(self):
+        return f'http://{self.host}:{self.port}/'
+
+    @property
+    def jwks_url(self):
+        return self.issuer + '.well-known/jwks.json'
+
+    def jwks(self):
+        public_key = self.key.publickey()
+        return {
+            'keys': [{
+                'kty': 'RSA',
+                'kid': self.kid,
+                'use': 'sig',
+                'alg': 'RS256',
+                'n': b64_uint(public_key.n),
+                'e': b64_uint(public_key.e)
+            }]
+        }
+
+    '''
+    mint(role, permissions=None, expires_in=3600, **claims)
+        returns a signed access token carrying the permissions of role
+        extra claims override the defaults, e.g. mint('manager', aud='other')
+    '''
+
+    def mint(self, role='manager', permissions=None, expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': f'local|{role}',
+            'aud': self.audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(ROLES[role] if permissions is None else permissions)
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.private_pem, algorithm='RS256', headers={'kid': self.kid})
+
+    '''
+    start()
+        serves the JWKS from a daemon thread
+        with port=0 a free port is picked and self.port is updated
+    '''
+
+    def start(self):
+        body = json.dumps(self.jwks()).encode('utf-8')
+
+        class JWKSHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/.well-known/jwks.json':
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'public, max-age=600')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), JWKSHandler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self):
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stop()
+
+
+def load_key(key_file):
+    if key_file and os.path.exists(key_file):
+        with open(key_file) as f:
+            return RSA.importKey(f.read())
+    key = RSA.generate(2048)
+    if key_file:
+        with open(key_file, 'wb') as f:
+            f.write(key.exportKey('PEM'))
+    return key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local JWKS server and token minter.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--audience', default=os.environ.get('API_AUDIENCE', 'dev'))
+    parser.add_argument('--key-file', help='PEM file to keep the signing key in between runs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('serve', help='serve /.well-known/jwks.json')
+    token = commands.add_parser('token', help='print an access token for a role')
+    token.add_argument('role', choices=sorted(ROLES))
+    token.add_argument('--expires-in', type=int, default=3600)
+    args = parser.parse_args(argv)
+    if args.command == 'token' and not args.key_file:
+        parser.error('token needs the --key-file of the running server')
+
+    issuer = LocalIssuer(args.host, args.port, args.audience, key=load_key(args.key_file))
+    if args.command == 'token':
+        print(issuer.mint(args.role, expires_in=args.expires_in))
+        return
+
+    issuer.start()
+    print(f'export AUTH0_ISSUER={issuer.issuer}')
+    print(f'export API_AUDIENCE={issuer.audience}')
+    for role in ROLES:
+        print(f'{role}: {issuer.mint(role)}')
+    issuer.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import threading
+
+
+'''
+PermissionRegistry
+Gives every permission used by a requires_auth decorator its own bit
+    the decorators register their permissions when the routes are defined,
+    so by the time requests arrive the registry is complete
+    a token's permissions are compiled once into an integer mask and every
+    endpoint check becomes a single AND against the endpoint's mask
+    permissions no endpoint asks for get no bit and are ignored
+    EXAMPLE
+        required = permission_registry.register(['post:drinks'])
+        granted = permission_registry.compile(payload)
+        allowed = granted & required == required
+'''
+
+
+class PermissionRegistry:
+    def __init__(self):
+        self.bits = {}
+        self._lock = threading.Lock()
+
+    '''
+    version
+        changes whenever a permission is registered; masks compiled under an
+        older version may be missing bits and have to be compiled again
+    '''
+
+    @property
+    def version(self):
+        return len(self.bits)
+
+    '''
+    register(permissions)
+        assigns a bit to every permission that has none yet
+        returns the mask of all the given permissions
+    '''
+
+    def register(self, permissions):
+        mask = 0
+        with self._lock:
+            for permission in permissions:
+                if permission not in self.bits:
+                    self.bits[permission] = 1 << len(self.bits)
+                mask |= self.bits[permission]
+        return mask
+
+    '''
+    compile(payload)
+        returns the mask of the registered permissions granted by a token
+    '''
+
+    def compile(self, payload):
+        bits = self.bits
+        mask = 0
+        for permission in payload.get('permissions') or ():
+            mask |= bits.get(permission, 0)
+        return mask
+
+
+permission_registry = PermissionRegistry()
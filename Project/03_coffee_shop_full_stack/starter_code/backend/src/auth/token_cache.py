@@ -0,0 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+'''
+TokenCache
+A bounded LRU cache of verified bearer tokens
+    entries are keyed by the sha256 of the token so raw tokens are never kept
+    an entry expires at the earlier of the token's exp and max_ttl seconds
+    after it was stored, and the least recently used entry is evicted once
+    max_size entries are held
+    EXAMPLE
+        cache_key = TokenCache.key(token)
+        payload = token_cache.get(cache_key)
+        if payload is None:
+            payload = verify_decode_jwt(token)
+            token_cache.set(cache_key, payload, payload.get('exp'))
+'''
+
+
+class TokenCache:
+    def __init__(self, max_size=1024, max_ttl=300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    '''
+    get(key)
+        returns the cached value for key or None if it is missing or expired
+    '''
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    '''
+    set(key, value, expires_at=None)
+        stores value until expires_at (a unix timestamp such as a token's exp)
+        or max_ttl seconds from now, whichever comes first
+    '''
+
+    def set(self, key, value, expires_at=None):
+        now = time.time()
+        deadline = now + self.max_ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        if deadline <= now or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,367 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from functools import partial
+from jose import jwk, jwt
+from jose.utils import base64url_decode
+
+from .jwks import key_fingerprint
+
+
+'''
+JoseVerifier
+Verifies signatures with python-jose's own key classes
+    this is the default backend, it needs nothing beyond requirements.txt
+'''
+
+
+class JoseVerifier:
+    name = 'jose'
+
+    def construct_key(self, key, algorithm):
+        return jwk.construct(key, algorithm)
+
+    def verify(self, signing_input, signature, public_key):
+        return public_key.verify(signing_input, signature)
+
+
+'''
+CryptographyVerifier
+Verifies signatures with the OpenSSL bindings of the cryptography package
+    supports RS256/384/512, ES256/384/512 and EdDSA (Ed25519)
+    cryptography is an optional dependency, install it to use this backend
+'''
+
+
+class CryptographyVerifier:
+    name = 'cryptography'
+
+    def __init__(self):
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+        from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+        self.InvalidSignature = InvalidSignature
+        self.ec = ec
+        self.ed25519 = ed25519
+        self.padding = padding
+        self.rsa = rsa
+        self.encode_dss_signature = encode_dss_signature
+        self.hashes = {'256': hashes.SHA256, '384': hashes.SHA384, '512': hashes.SHA512}
+        self.curves = {'P-256': ec.SECP256R1, 'P-384': ec.SECP384R1, 'P-521': ec.SECP521R1}
+
+    @staticmethod
+    def _int(value):
+        return int.from_bytes(base64url_decode(value.encode('utf-8')), 'big')
+
+    '''
+    construct_key(key, algorithm)
+        returns (algorithm, public key) for a JWK dict
+    '''
+
+    def construct_key(self, key, algorithm):
+        if algorithm.startswith('RS') and key['kty'] == 'RSA':
+            numbers = self.rsa.RSAPublicNumbers(self._int(key['e']), self._int(key['n']))
+            return algorithm, numbers.public_key()
+        if algorithm.startswith('ES') and key['kty'] == 'EC':
+            numbers = self.ec.EllipticCurvePublicNumbers(
+                self._int(key['x']), self._int(key['y']), self.curves[key['crv']]()
+            )
+            return algorithm, numbers.public_key()
+        if algorithm == 'EdDSA' and key['kty'] == 'OKP' and key['crv'] == 'Ed25519':
+            public_bytes = base64url_decode(key['x'].encode('utf-8'))
+            return algorithm, self.ed25519.Ed25519PublicKey.from_public_bytes(public_bytes)
+        raise jwt.JWTError(f'Unsupported key for {algorithm}')
+
+    def verify(self, signing_input, signature, public_key):
+        algorithm, key = public_key
+        try:
+            if algorithm.startswith('RS'):
+                key.verify(signature, signing_input, self.padding.PKCS1v15(),
+                           self.hashes[algorithm[2:]]())
+            elif algorithm.startswith('ES'):
+                # JWS carries the raw r || s pair, cryptography expects DER
+                half = len(signature) // 2
+                der = self.encode_dss_signature(
+                    int.from_bytes(signature[:half], 'big'),
+                    int.from_bytes(signature[half:], 'big')
+                )
+                key.verify(der, signing_input, self.ec.ECDSA(self.hashes[algorithm[2:]]()))
+            else:
+                key.verify(signature, signing_input)
+        except self.InvalidSignature:
+            return False
+        return True
+
+
+VERIFIERS = {
+    'jose': JoseVerifier,
+    'cryptography': CryptographyVerifier
+}
+_verifiers = {}
+
+
+'''
+get_verifier(name)
+    returns the shared instance of the verifier backend called name
+'''
+
+
+def get_verifier(name):
+    if name not in _verifiers:
+        if name not in VERIFIERS:
+            raise ValueError(f'Unknown JWT verifier {name!r}, expected one of {sorted(VERIFIERS)}')
+        _verifiers[name] = VERIFIERS[name]()
+    return _verifiers[name]
+
+
+'''
+verify_signature(token, public_key, verifier)
+    checks the signature of token against a key built by verifier.construct_key
+    raises jwt.JWTError if it does not match
+'''
+
+
+def verify_signature(token, public_key, verifier):
+    signing_input, _, signature = token.rpartition('.')
+    if not verifier.verify(signing_input.encode('utf-8'),
+                           base64url_decode(signature.encode('utf-8')),
+                           public_key):
+        raise jwt.JWTError('Signature verification failed.')
+
+
+'''
+allowed_algorithm(token, algorithms)
+    returns the alg of the token's header, raises jwt.JWTError unless it is
+    one of algorithms; checked before a key is built for that alg
+'''
+
+
+def allowed_algorithm(token, algorithms):
+    algorithm = jwt.get_unverified_header(token).get('alg')
+    if algorithm not in algorithms:
+        raise jwt.JWTError('The specified alg value is not allowed')
+    return algorithm
+
+
+'''
+decode_token(token, rsa_key, public_key, algorithms, audience, issuer, verifier)
+    verifies the signature with public_key, built for the alg returned by
+    allowed_algorithm, and returns the validated claims
+    raises the same jose errors as jwt.decode
+'''
+
+
+def decode_token(token, rsa_key, public_key, algorithms, audience, issuer, verifier):
+    verify_signature(token, public_key, verifier)
+    return jwt.decode(
+        token,
+        rsa_key,
+        algorithms=algorithms,
+        audience=audience,
+        issuer=issuer,
+        options={'verify_signature': False}
+    )
+
+
+# key objects built inside a pool worker, keyed like JWKSCache.key_objects
+_worker_keys = {}
+
+
+def _worker_key(rsa_key, algorithm, verifier):
+    cache_key = key_fingerprint(rsa_key) + (algorithm, verifier.name)
+    key = _worker_keys.get(cache_key)
+    if key is None:
+        if len(_worker_keys) > 32:
+            # the issuer rotated its keys more often than we expect; start over
+            _worker_keys.clear()
+        key = verifier.construct_key(rsa_key, algorithm)
+        _worker_keys[cache_key] = key
+    return key
+
+
+'''
+decode_batch(requests)
+    runs in a pool worker; decodes every (token, rsa_key, algorithms,
+    audience, issuer, verifier name) request and returns, in order, the
+    claims or the exception that request raised
+'''
+
+
+def decode_batch(requests):
+    results = []
+    for token, rsa_key, algorithms, audience, issuer, verifier_name in requests:
+        try:
+            verifier = get_verifier(verifier_name)
+            algorithm = allowed_algorithm(token, algorithms)
+            public_key = _worker_key(rsa_key, algorithm, verifier)
+            results.append(decode_token(token, rsa_key, public_key, algorithms, audience, issuer, verifier))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+'''
+VerifierUnavailable
+    raised by VerifierPool.decode when no worker answered in time or the
+    pool could not take the token, the token itself may well be valid
+'''
+
+
+class VerifierUnavailable(Exception):
+    pass
+
+
+'''
+VerifierPool
+Offloads token verification to worker processes
+    RSA verification holds the GIL, so under many concurrent requests the
+    threads of one worker take turns; the pool spreads it over processes
+    requests arriving within batch_window seconds of each other are sent to
+    the pool as one task of up to max_batch tokens, which amortizes the
+    pickling and inter-process round trip
+    the worker processes are started on first use; a pool broken by a
+    crashed worker is replaced by a new one, the tokens it held fail with
+    VerifierUnavailable, as do those not verified within timeout seconds
+    EXAMPLE
+        pool = VerifierPool(processes=4, batch_window=0.002)
+        payload = pool.decode(token, rsa_key, ['RS256'], 'dev', 'https://tenant/', 'jose')
+'''
+
+
+class VerifierPool:
+    def __init__(self, processes=None, batch_window=0.002, max_batch=64, timeout=5):
+        self.processes = processes
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._executor = None
+        self._collector = None
+        self._lock = threading.Lock()
+
+    def _new_executor(self):
+        # spawn rather than fork: the api process already runs threads
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def _start(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = self._new_executor()
+            self._collector = threading.Thread(
+                target=self._collect,
+                args=(self._queue,),
+                name='jwt-verifier-batches',
+                daemon=True
+            )
+            self._collector.start()
+
+    '''
+    decode(token, rsa_key, algorithms, audience, issuer, verifier_name)
+        blocks until a worker has verified token and returns its claims
+        or raises the jose error the worker ran into, VerifierUnavailable
+        if there was no answer within timeout seconds
+    '''
+
+    def decode(self, token, rsa_key, algorithms, audience, issuer, verifier_name='jose'):
+        if self._executor is None:
+            self._start()
+        future = Future()
+        self._queue.put(((token, rsa_key, tuple(algorithms), audience, issuer, verifier_name), future))
+        try:
+            result = future.result(self.timeout)
+        except TimeoutError:
+            raise VerifierUnavailable('no verifier answered in time')
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _collect(self, requests):
+        while True:
+            batch = [requests.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    if timeout > 0:
+                        item = requests.get(timeout=timeout)
+                    else:
+                        item = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # shut down: fail what was collected and stop
+                    self._resolve([future for _, future in batch], None, VerifierUnavailable('verifier pool shut down'))
+                    return
+                batch.append(item)
+            self._submit(batch)
+
+    def _submit(self, batch):
+        futures = [future for _, future in batch]
+        for attempt in range(2):
+            with self._lock:
+                executor = self._executor
+            if executor is None:
+                break
+            try:
+                task = executor.submit(decode_batch, [request for request, _ in batch])
+            except Exception:
+                # a worker died (BrokenProcessPool): replace the pool and retry once
+                self._replace(executor)
+                continue
+            task.add_done_callback(partial(self._done, executor, futures))
+            return
+        self._resolve(futures, None, VerifierUnavailable('verifier pool unavailable'))
+
+    def _replace(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return
+            broken.shutdown(wait=False)
+            self._executor = self._new_executor()
+
+    def _done(self, executor, futures, task):
+        try:
+            results = task.result()
+        except Exception as e:
+            # the batch was lost with its worker, the next one gets a new pool
+            self._replace(executor)
+            self._resolve(futures, None, VerifierUnavailable(f'verifier worker failed: {e!r}'))
+            return
+        self._resolve(futures, results)
+
+    @staticmethod
+    def _resolve(futures, results, error=None):
+        if results is None:
+            results = [error] * len(futures)
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    '''
+    shutdown()
+        stops the collector, then waits for the workers to exit; a pool
+        left to the interpreter's exit handlers can hang joining them
+        the next decode() starts a new pool
+    '''
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            collector, self._collector = self._collector, None
+            requests, self._queue = self._queue, queue.Queue()
+        if executor is None:
+            return
+        requests.put(None)
+        if collector is not None and collector is not threading.current_thread():
+            collector.join()
+        executor.shutdown(wait=True)
@@ -0,0 +1,217 @@
+import collections
+import os
+import threading
+
+from . import json_provider
+from .database.models import DrinkChange, DrinkRow, menu_listeners
+
+VIEWS = ('short', 'long')
+
+'''
+format_event(version, event, data)
+    returns a server-sent event: its id is the change version, so a client
+    reconnecting sends it back as Last-Event-ID
+'''
+
+
+def format_event(version, event, data):
+    return f'id: {version}\nevent: {event}\ndata: {json_provider.dumps(data)}\n\n'
+
+
+'''
+change_events(rows, views)
+    returns {view: [event, ...]} for rows of DrinkChange.events(), with an
+    insert, update or delete event per change in each of views; a drink
+    deleted since it was changed gets no event for that change, its delete
+    event follows
+'''
+
+
+def change_events(rows, views):
+    events = {view: [] for view in views}
+    for version, drink_id, operation, title, recipe, recipe_short in rows:
+        if operation == 'delete':
+            for view in views:
+                events[view].append(format_event(version, operation, {'id': drink_id}))
+        elif title is not None:
+            drink = DrinkRow(drink_id, title, recipe, recipe_short)
+            for view in views:
+                events[view].append(format_event(version, operation, getattr(drink, view)()))
+    return events
+
+
+class Subscriber:
+    __slots__ = ('view', 'queue', 'dropped', '_ready')
+
+    def __init__(self, view, ready):
+        self.view = view
+        self.queue = collections.deque()
+        self.dropped = False
+        self._ready = ready
+
+    '''
+    get(timeout)
+        returns the queued events, waiting up to timeout seconds for the
+        first one; [] on timeout or once the subscriber was dropped
+    '''
+
+    def get(self, timeout):
+        with self._ready:
+            if not self.queue and not self.dropped:
+                self._ready.wait(timeout)
+        events = []
+        while self.queue:
+            events.append(self.queue.popleft())
+        return events
+
+
+'''
+BroadcastHub
+Fans the menu events out to the subscribed streams
+    every subscriber has a view ('short' or 'long') and a queue of at most
+    max_queue events; publish() appends the events of its view to each
+    queue without ever blocking, so a slow client cannot hold up the others
+    a subscriber whose queue would overflow is dropped: its stream ends and
+    the client reconnects with Last-Event-ID to catch up from the change log
+    an idle subscriber is a deque, nothing runs on its behalf; the
+    subscribers of a view wait on one Condition, which publish() notifies
+    once when that view has events
+    at most max_subscribers are subscribed at a time, subscribe() returns
+    None for the subscriber beyond that
+    version is the last change published; subscribe() returns it, the queue
+    of the new subscriber receives everything after it
+    EXAMPLE
+        subscriber, version = hub.subscribe('short')
+        events = subscriber.get(timeout=15)
+'''
+
+
+class BroadcastHub:
+    def __init__(self, max_queue=256, max_subscribers=1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.version = 0
+        self.published = 0
+        self.dropped = 0
+        self.refused = 0
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._ready = {view: threading.Condition() for view in VIEWS}
+
+    def subscribe(self, view):
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                self.refused += 1
+                return None, self.version
+            subscriber = Subscriber(view, self._ready[view])
+            self.subscribers.add(subscriber)
+            return subscriber, self.version
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    '''
+    publish(events, version)
+        hands events[view] to the subscribers of each view and records
+        version as published
+    '''
+
+    def publish(self, events, version):
+        with self._lock:
+            for subscriber in list(self.subscribers):
+                batch = events.get(subscriber.view)
+                if not batch:
+                    continue
+                if len(subscriber.queue) + len(batch) > self.max_queue:
+                    self._drop(subscriber)
+                    continue
+                subscriber.queue.extend(batch)
+            self.version = version
+            self.published += 1
+        for view, ready in self._ready.items():
+            if events.get(view):
+                with ready:
+                    ready.notify_all()
+
+    def _drop(self, subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.dropped = True
+        subscriber.queue.clear()
+        self.dropped += 1
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'version': self.version,
+            'published': self.published,
+            'dropped': self.dropped,
+            'refused': self.refused
+        }
+
+
+'''
+ChangeFeed
+Publishes the drink_changes log to a BroadcastHub
+    a thread reads the changes after hub.version whenever this process
+    commits one (menu_listeners) and every interval seconds, which picks
+    up the commits of other worker processes too
+    every change is serialized once per view, however many subscribers
+    there are
+    if the log was compacted past hub.version, or the database does not
+    commit it in order (DrinkChange.commit_ordered), every stream gets a
+    resync event and the feed continues from the current version
+    the thread is started on first use in each process, start() must be
+    called with an app context
+'''
+
+
+class ChangeFeed:
+    def __init__(self, app, hub, interval=1.0, batch_size=500):
+        self.app = app
+        self.hub = hub
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+        menu_listeners.append(self.notify)
+
+    def notify(self, version=None):
+        self._wake.set()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # streams start with the changes committed from now on
+            self.hub.version = DrinkChange.bounds()[1]
+            threading.Thread(target=self._run, name='change-feed', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception:
+                # the database may be briefly locked, the next poll retries
+                continue
+
+    def poll(self):
+        oldest, current = DrinkChange.bounds()
+        after = self.hub.version
+        if not DrinkChange.complete_after(after, oldest, current):
+            resync = format_event(current, 'resync', {'version': current})
+            self.hub.publish({view: [resync] for view in VIEWS}, current)
+            return
+        while after < current:
+            rows = DrinkChange.events(after, current, self.batch_size)
+            if not rows:
+                break
+            after = rows[-1][0]
+            self.hub.publish(change_events(rows, VIEWS), after)
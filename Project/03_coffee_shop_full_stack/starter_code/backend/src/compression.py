@@ -0,0 +1,108 @@
+import gzip
+import os
+from flask import request
+
+from .timing import timed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+'''
+Response compression negotiated through Accept-Encoding
+    COMPRESSION=0 turns it off
+    COMPRESS_MIN_SIZE bodies smaller than this many bytes (1024) are sent as
+                      they are, compressing them saves less than it costs
+    GZIP_LEVEL        1 to 9, 6 by default
+    BROTLI_QUALITY    0 to 11, 5 by default; br is only offered when the
+                      brotli package is installed
+    init_app(app) compresses the JSON responses after the view; the menu
+    listings are compressed by menu_response instead, once per menu version,
+    and kept in menu_cache next to the uncompressed body
+    a compressed response carries the weak form of the body's ETag, as a
+    revalidation only needs to match the content, not its encoding
+'''
+
+
+COMPRESSION = os.environ.get('COMPRESSION', '1') == '1'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson')
+
+
+def gzip_compress(body):
+    # mtime=0 keeps the output, and so the cached variants, deterministic
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def brotli_compress(body):
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+# encodings by order of preference when the client accepts several equally
+ENCODERS = {'gzip': gzip_compress}
+if brotli is not None:
+    ENCODERS = {'br': brotli_compress, 'gzip': gzip_compress}
+
+
+'''
+negotiate(request, size)
+    returns the encoding to send a body of size bytes in, or None to send it
+    uncompressed
+'''
+
+
+def negotiate(request, size):
+    if not COMPRESSION or size < COMPRESS_MIN_SIZE:
+        return None
+    best, best_quality = None, 0
+    for encoding in ENCODERS:
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    return ENCODERS[encoding](body)
+
+
+'''
+encode(response, body, encoding)
+    sets body, already compressed with encoding unless that is None, as the
+    content of response; the response must already carry its ETag
+'''
+
+
+def encode(response, body, encoding):
+    response.vary.add('Accept-Encoding')
+    response.set_data(body)
+    if encoding is None:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if not COMPRESSION:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESS_MIMETYPES):
+            return response
+        body = response.get_data()
+        encoding = negotiate(request, len(body))
+        if encoding is not None:
+            with timed('compress'):
+                body = compress(body, encoding)
+        return encode(response, body, encoding)
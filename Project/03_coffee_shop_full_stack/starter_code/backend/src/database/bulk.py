@@ -0,0 +1,273 @@
+import os
+from sqlalchemy import bindparam
+
+from .models import db, Drink, DrinkIngredient, bump_menu_version, ingredient_ids, normalize_recipe, record_changes, short_recipe
+
+
+'''
+Bulk writes of drinks
+    every batch is validated as a whole first, so either all of its items
+    are written or none; the writes then run as a handful of executemany
+    statements in a single transaction, one commit (and one fsync) per batch
+    instead of one per drink
+    EXAMPLE
+        rows = validate_creates(request_body['drinks'])
+        drinks = create_drinks(rows)
+'''
+
+# most items a single batch may hold
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 500))
+
+
+'''
+BulkError
+    raised when a batch is rejected, errors lists {'index': i, 'message': m}
+    for every item that is invalid (index None for the batch itself)
+'''
+
+
+class BulkError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def check_batch(items, kind=dict):
+    if not isinstance(items, list) or not items:
+        raise BulkError([{'index': None, 'message': 'expected a non-empty list'}])
+    if len(items) > BULK_MAX_ITEMS:
+        raise BulkError([{'index': None, 'message': f'at most {BULK_MAX_ITEMS} items per batch'}])
+    errors = [
+        {'index': index, 'message': f'expected {kind.__name__}'}
+        for index, item in enumerate(items)
+        if not isinstance(item, kind) or isinstance(item, bool)
+    ]
+    if errors:
+        raise BulkError(errors)
+    return items
+
+
+def check_title(title):
+    if not isinstance(title, str) or not title:
+        raise ValueError('title must be a non-empty string')
+    return title
+
+
+def taken_titles(titles):
+    if not titles:
+        return {}
+    return dict(db.session.query(Drink.title, Drink.id).filter(Drink.title.in_(titles)))
+
+
+'''
+validate_creates(items)
+    checks a list of {'title': ..., 'recipe': ...} and returns the rows to
+    insert, raises BulkError if any item is invalid
+'''
+
+
+def validate_creates(items):
+    errors = []
+    rows = []
+    for index, item in enumerate(check_batch(items)):
+        try:
+            title = check_title(item.get('title'))
+            if any(row['title'] == title for _, row in rows):
+                raise ValueError('title appears twice in the batch')
+            rows.append((index, {'title': title, 'recipe': normalize_recipe(item.get('recipe'))}))
+        except ValueError as e:
+            errors.append({'index': index, 'message': str(e)})
+    taken = taken_titles([row['title'] for _, row in rows])
+    errors += [
+        {'index': index, 'message': 'a drink with this title already exists'}
+        for index, row in rows if row['title'] in taken
+    ]
+    if errors:
+        raise BulkError(sorted(errors, key=lambda error: error['index']))
+    return [row for _, row in rows]
+
+
+'''
+validate_updates(items)
+    checks a list of {'id': ..., 'title': ..., 'recipe': ...}, title and
+    recipe being optional, and returns the complete rows after the update
+    raises BulkError if any item is invalid or names a missing drink
+'''
+
+
+def validate_updates(items):
+    errors = []
+    changes = []
+    for index, item in enumerate(check_batch(items)):
+        try:
+            drink_id = item.get('id')
+            if not isinstance(drink_id, int) or isinstance(drink_id, bool):
+                raise ValueError('id must be an integer')
+            if any(change['id'] == drink_id for _, change in changes):
+                raise ValueError('id appears twice in the batch')
+            change = {'id': drink_id}
+            if item.get('title') is not None:
+                change['title'] = check_title(item['title'])
+                if any(other.get('title') == change['title'] for _, other in changes):
+                    raise ValueError('title appears twice in the batch')
+            if item.get('recipe') is not None:
+                change['recipe'] = normalize_recipe(item['recipe'])
+            if len(change) == 1:
+                raise ValueError('nothing to update, give a title or a recipe')
+            changes.append((index, change))
+        except ValueError as e:
+            errors.append({'index': index, 'message': str(e)})
+
+    current = {}
+    if changes:
+        current = {
+            drink.id: drink
+            for drink in Drink.query.filter(Drink.id.in_([change['id'] for _, change in changes]))
+        }
+    taken = taken_titles([change['title'] for _, change in changes if 'title' in change])
+    rows = []
+    for index, change in changes:
+        drink = current.get(change['id'])
+        if drink is None:
+            errors.append({'index': index, 'message': 'drink not found'})
+        elif taken.get(change.get('title'), drink.id) != drink.id:
+            errors.append({'index': index, 'message': 'a drink with this title already exists'})
+        else:
+            rows.append({
+                'id': drink.id,
+                'title': change.get('title', drink.title),
+                'recipe': change.get('recipe', drink.recipe)
+            })
+    if errors:
+        raise BulkError(sorted(errors, key=lambda error: error['index']))
+    return rows
+
+
+'''
+validate_deletes(ids)
+    checks a list of drink ids and returns it, raises BulkError if any id is
+    not an integer, appears twice or names a missing drink
+'''
+
+
+def validate_deletes(ids):
+    check_batch(ids, int)
+    existing = {drink_id for drink_id, in db.session.query(Drink.id).filter(Drink.id.in_(ids))}
+    errors = []
+    seen = set()
+    for index, drink_id in enumerate(ids):
+        if drink_id in seen:
+            errors.append({'index': index, 'message': 'id appears twice in the batch'})
+        elif drink_id not in existing:
+            errors.append({'index': index, 'message': 'drink not found'})
+        seen.add(drink_id)
+    if errors:
+        raise BulkError(errors)
+    return ids
+
+
+def insert_ingredient_rows(rows):
+    ids = ingredient_ids({r['name'] for row in rows for r in row['recipe']})
+    params = [
+        {
+            'drink_id': row['id'],
+            'ingredient_id': ids[r['name']],
+            'position': position,
+            'color': r['color'],
+            'parts': r['parts']
+        }
+        for row in rows
+        for position, r in enumerate(row['recipe'])
+    ]
+    if params:
+        db.session.execute(DrinkIngredient.__table__.insert(), params)
+
+
+def commit():
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    bump_menu_version()
+
+
+'''
+create_drinks(rows)
+    inserts the rows returned by validate_creates and returns their long()
+    representation, in order
+'''
+
+
+def create_drinks(rows):
+    table = Drink.__table__
+    try:
+        db.session.execute(table.insert(), [
+            {'title': row['title'], 'recipe': row['recipe'], 'recipe_short': short_recipe(row['recipe'])}
+            for row in rows
+        ])
+        # titles are unique, which gives back the ids the executemany assigned
+        ids = taken_titles([row['title'] for row in rows])
+        rows = [dict(row, id=ids[row['title']]) for row in rows]
+        insert_ingredient_rows(rows)
+        record_changes(db.session, [row['id'] for row in rows], 'insert')
+    except Exception:
+        db.session.rollback()
+        raise
+    commit()
+    return [{'id': row['id'], 'title': row['title'], 'recipe': row['recipe']} for row in rows]
+
+
+'''
+update_drinks(rows)
+    writes the rows returned by validate_updates and returns their long()
+    representation, in order
+'''
+
+
+def update_drinks(rows):
+    table = Drink.__table__
+    try:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam('drink_id'))
+            .values(title=bindparam('title'), recipe=bindparam('recipe'), recipe_short=bindparam('recipe_short')),
+            [
+                {
+                    'drink_id': row['id'],
+                    'title': row['title'],
+                    'recipe': row['recipe'],
+                    'recipe_short': short_recipe(row['recipe'])
+                }
+                for row in rows
+            ]
+        )
+        ingredients = DrinkIngredient.__table__
+        db.session.execute(ingredients.delete().where(ingredients.c.drink_id.in_([row['id'] for row in rows])))
+        insert_ingredient_rows(rows)
+        record_changes(db.session, [row['id'] for row in rows], 'update')
+    except Exception:
+        db.session.rollback()
+        raise
+    commit()
+    return [{'id': row['id'], 'title': row['title'], 'recipe': row['recipe']} for row in rows]
+
+
+'''
+delete_drinks(ids)
+    deletes the drinks validated by validate_deletes, with their
+    ingredient rows
+'''
+
+
+def delete_drinks(ids):
+    ingredients = DrinkIngredient.__table__
+    table = Drink.__table__
+    try:
+        db.session.execute(ingredients.delete().where(ingredients.c.drink_id.in_(ids)))
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        record_changes(db.session, ids, 'delete')
+    except Exception:
+        db.session.rollback()
+        raise
+    commit()
+    return ids
@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .models import db, Drink, bump_menu_version, normalize_recipe
+
+
+'''
+Drink mutations
+    insert_drink, update_drink and delete_drink stage a change in the current
+    session without committing it and return the drink; run_write commits a
+    single one, GroupCommitWriter commits many together
+    they raise LookupError for a missing drink and ValueError for an
+    invalid recipe before touching the session
+'''
+
+
+def insert_drink(title, recipe):
+    drink = Drink(title=title, recipe=recipe)
+    db.session.add(drink)
+    return drink
+
+
+def update_drink(drink_id, title=None, recipe=None):
+    drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
+    if drink is None:
+        raise LookupError(f'drink {drink_id} not found')
+    if recipe:
+        # validated first so a bad recipe leaves no half applied change
+        recipe = normalize_recipe(recipe)
+    if title:
+        drink.title = title
+    if recipe:
+        drink.recipe = recipe
+    return drink
+
+
+def delete_drink(drink_id):
+    drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
+    if drink is None:
+        raise LookupError(f'drink {drink_id} not found')
+    db.session.delete(drink)
+    return drink
+
+
+'''
+run_write(operation, *args)
+    runs one of the mutations above in the current session, commits it and
+    returns the long() representation of the drink
+'''
+
+
+def run_write(operation, *args):
+    try:
+        drink = operation(*args)
+        db.session.flush()
+        result = drink.long()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    bump_menu_version()
+    return result
+
+
+'''
+GroupCommitWriter
+Sends drink mutations to a single writer thread
+    SQLite has one writer at a time, so concurrent requests committing on
+    their own queue up on the write lock and each pays for its own commit
+    the writer thread takes every mutation that arrives within window
+    seconds of the first (at most max_batch) and commits them as one
+    transaction; each caller's future resolves with its own outcome
+    if the batch fails, e.g. two drinks with the same title, it is rolled
+    back and replayed one mutation per transaction, so the error reaches
+    only the caller that caused it
+    the thread is started on first use in each process
+    EXAMPLE
+        writer = GroupCommitWriter(app, window=0.002)
+        drink = writer.submit(insert_drink, 'latte', recipe)
+'''
+
+
+class GroupCommitWriter:
+    def __init__(self, app, window=0.002, max_batch=64):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # a forked worker does not inherit the thread, start its own
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='drink-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    '''
+    submit(operation, *args)
+        blocks until the writer has committed operation(*args) and returns
+        the long() representation of the drink, or raises what it raised
+    '''
+
+    def submit(self, operation, *args):
+        if self._pid != os.getpid():
+            self._start()
+        future = Future()
+        self._queue.put(((operation, args), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    if timeout > 0:
+                        batch.append(self._queue.get(timeout=timeout))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                self._commit(batch)
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            for (operation, args), future in batch:
+                try:
+                    outcomes.append((future, operation(*args), None))
+                except (LookupError, ValueError) as e:
+                    outcomes.append((future, None, e))
+            db.session.flush()
+            outcomes = [
+                (future, drink.long() if drink is not None else None, error)
+                for future, drink, error in outcomes
+            ]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            for item in batch:
+                self._commit([item])
+            return
+        bump_menu_version()
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {'batches': self.batches, 'writes': self.writes}
@@ -0,0 +1,149 @@
+import json
+import os
+from flask import Request, current_app
+
+
+'''
+JSON encoding and decoding for the whole api
+    responses (jsonify), request bodies (request.get_json) and the recipe
+    columns all go through the provider chosen with JSON_PROVIDER:
+        orjson  the native orjson package, install it separately
+        json    the standard library
+        auto    orjson when it is installed, json otherwise (the default)
+    both produce compact output with sorted keys, like Flask's jsonify
+    the module level dumps/loads/jsonify follow use(), so a provider can be
+    swapped at runtime (the benchmarks do)
+    EXAMPLE
+        from . import json_provider
+        json_provider.init_app(app)
+        return json_provider.jsonify({'success': True})
+'''
+
+
+class StdlibProvider:
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+    def dumpb(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonProvider:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+
+        self.orjson = orjson
+        # int keys are turned into strings, as the standard library does
+        self.option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return self.orjson.dumps(obj, option=self.option).decode('utf-8')
+
+    def dumpb(self, obj):
+        return self.orjson.dumps(obj, option=self.option)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+PROVIDERS = {
+    'orjson': OrjsonProvider,
+    'json': StdlibProvider
+}
+_providers = {}
+
+
+'''
+get_provider(name)
+    returns the shared instance of the provider called name, 'auto' picks
+    orjson if it can be imported and falls back to the standard library
+'''
+
+
+def get_provider(name):
+    if name == 'auto':
+        try:
+            return get_provider('orjson')
+        except ImportError:
+            return get_provider('json')
+    if name not in _providers:
+        if name not in PROVIDERS:
+            raise ValueError(f'Unknown JSON provider {name!r}, expected auto or one of {sorted(PROVIDERS)}')
+        _providers[name] = PROVIDERS[name]()
+    return _providers[name]
+
+
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+provider = get_provider(JSON_PROVIDER)
+
+
+def use(name):
+    global provider
+    provider = get_provider(name)
+    return provider
+
+
+def dumps(obj):
+    return provider.dumps(obj)
+
+
+def dumpb(obj):
+    return provider.dumpb(obj)
+
+
+def loads(data):
+    return provider.loads(data)
+
+
+'''
+jsonify(*args, **kwargs)
+    Flask's jsonify, encoded by the provider
+'''
+
+
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    data = args[0] if len(args) == 1 else (args or kwargs)
+    return current_app.response_class(provider.dumpb(data) + b'\n', mimetype='application/json')
+
+
+'''
+JSONRequest
+A Request whose get_json() (and json) decodes with the provider
+    behaves like Flask 1.0's: None unless the body is JSON or force is
+    given, on_json_loading_failed for a malformed body unless silent
+'''
+
+
+class JSONRequest(Request):
+    _provider_json = None
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if cache and self._provider_json is not None:
+            return self._provider_json[0]
+        if not (force or self.is_json):
+            return None
+        data = self.get_data(cache=cache)
+        try:
+            rv = provider.loads(data)
+        except ValueError as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+        if cache:
+            self._provider_json = (rv,)
+        return rv
+
+
+def init_app(app):
+    app.request_class = JSONRequest
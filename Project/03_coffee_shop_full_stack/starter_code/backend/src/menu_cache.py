@@ -0,0 +1,89 @@
+import hashlib
+
+
+'''
+MenuCache
+Keeps the fully serialized response body of the drink listings
+    entries are keyed by view ('short', 'long') and stored with the change
+    log version they were built from; they are only served while that
+    version is current, so any committed insert, update or delete of a drink
+    makes them all stale at once
+    each body is stored with a strong ETag, by default a hash of its
+    content, so the tag stays valid across restarts and worker processes,
+    and with its compressed variants, built on first request per encoding
+    (variant)
+    EXAMPLE
+        version = DrinkChange.current()
+        cached = menu_cache.get('short', version)
+        if cached is None:
+            cached = menu_cache.set('short', version, build_body())
+        body, etag = cached
+'''
+
+
+class MenuCache:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.compressions = 0
+        self._entries = {}
+
+    '''
+    get(key, version)
+        returns (body, etag) if key is cached for version, otherwise None
+    '''
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1:3]
+        self.misses += 1
+        return None
+
+    '''
+    set(key, version, body, etag=None)
+        caches body for version and returns (body, etag); etag is the hash
+        of body unless given
+    '''
+
+    def set(self, key, version, body, etag=None):
+        if etag is None:
+            etag = hashlib.sha256(body).hexdigest()[:32]
+        current = self._entries.get(key)
+        # a slow request must not overwrite a body built from a newer menu
+        if current is None or current[0] <= version:
+            self._entries[key] = (version, body, etag, {})
+        return body, etag
+
+    '''
+    variant(key, version, encoding, compress)
+        returns the body of key for version compressed with encoding,
+        calling compress(body) only the first time; None if key is not
+        cached for version
+    '''
+
+    def variant(self, key, version, encoding, compress):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        variants = entry[3]
+        if encoding not in variants:
+            variants[encoding] = compress(entry[1])
+            self.compressions += 1
+        return variants[encoding]
+
+    def clear(self):
+        self._entries = {}
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'variants': sum(len(entry[3]) for entry in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'compressions': self.compressions
+        }
+
+
+menu_cache = MenuCache()
@@ -0,0 +1,84 @@
+import threading
+
+
+'''
+SingleFlight
+Runs identical concurrent computations once
+    the first caller for a key (the leader) runs fn; callers arriving with
+    the same key while it runs (followers) wait for it and get its result,
+    or have its exception raised; nothing is kept once the leader is done,
+    the next call for the key runs fn again
+    keys must hold everything the result depends on, a follower gets the
+    leader's result as it is
+    EXAMPLE
+        flights = SingleFlight()
+        body = flights.do(('menu', 'short', version), build_body)
+'''
+
+
+class Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self.max_waiters = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    '''
+    do(key, fn)
+        returns fn(), or the result of the fn already running for key
+    '''
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.leaders += 1
+            else:
+                flight.waiters += 1
+                self.followers += 1
+                self.max_waiters = max(self.max_waiters, flight.waiters)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    '''
+    stats()
+        leaders: computations run, followers: calls that shared one instead,
+        in_flight: computations running now, max_waiters: most followers
+        seen on a single computation
+    '''
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'max_waiters': self.max_waiters
+        }
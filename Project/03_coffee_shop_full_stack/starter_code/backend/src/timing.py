@@ -0,0 +1,50 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g
+
+
+# report per request time spent in auth, db and serialization as a
+# Server-Timing header, used by benchmarks/api_bench.py
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+
+'''
+timed(name)
+    adds the time spent in the block to the current request's `name` section
+    EXAMPLE
+        with timed('db'):
+            drinks = Drink.query.all()
+'''
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if SERVER_TIMING:
+            timings = g.setdefault('timings', {})
+            timings[name] = timings.get(name, 0) + time.perf_counter() - start
+
+
+'''
+init_app(app)
+    sends the collected sections as Server-Timing: auth;dur=0.412, db;dur=1.3
+    durations are in milliseconds
+'''
+
+
+def init_app(app):
+    if not SERVER_TIMING:
+        return
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = g.get('timings')
+        if timings:
+            response.headers['Server-Timing'] = ', '.join(
+                f'{name};dur={seconds * 1000:.3f}' for name, seconds in timings.items()
+            )
+        return response
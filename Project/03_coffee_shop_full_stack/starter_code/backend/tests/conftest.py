@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+'''
+Fixtures for the api tests
+    the api is imported once per test run, against a throwaway SQLite file
+    and a local issuer (see benchmarks/harness.py); every test starts from
+    freshly seeded drinks
+    USAGE (from /backend)
+        python -m pytest tests
+'''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# read when src.api is imported: no background JWKS refresher, short stream
+# keepalives so a test reading an event stream never waits long
+os.environ.setdefault('JWKS_BACKGROUND_REFRESH', '0')
+os.environ.setdefault('SSE_KEEPALIVE', '0.2')
+
+from benchmarks.harness import load_app, seed_drinks, start_issuer  # noqa: E402
+
+issuer = start_issuer()
+app, db = load_app()
+
+from src.auth import auth  # noqa: E402
+from src.menu_cache import menu_cache  # noqa: E402
+
+DRINKS = 5
+
+
+@pytest.fixture
+def client():
+    seed_drinks(app, db, DRINKS)
+    # seeding bypasses bump_menu_version, the tokens are kept
+    menu_cache.clear()
+    auth.rejected_tokens.clear()
+    return app.test_client()
+
+
+@pytest.fixture
+def mint():
+    return issuer.mint
+
+
+@pytest.fixture
+def manager():
+    return {'Authorization': 'Bearer ' + issuer.mint('manager')}
+
+
+@pytest.fixture
+def barista():
+    return {'Authorization': 'Bearer ' + issuer.mint('barista')}
+
@@ -0,0 +1,46 @@
+import pytest
+
+from src.auth import auth
+from src.auth.auth import AuthError, check_permission_mask
+from src.auth.permissions import PermissionRegistry
+
+
+def bearer(token):
+    return {'Authorization': 'Bearer ' + token}
+
+
+def test_expired_and_foreign_tokens_are_refused(client, mint):
+    for token in (mint('barista', expires_in=-10), mint('barista', aud='other'), mint('barista', iss='https://elsewhere/')):
+        assert client.get('/drinks-detail', headers=bearer(token)).status_code == 401
+    assert client.get('/drinks-detail', headers=bearer('not.a.token')).status_code == 400
+
+
+def test_rejected_tokens_are_refused_from_the_cache(client, mint, monkeypatch):
+    expired = mint('barista', expires_in=-10)
+    client.get('/drinks-detail', headers=bearer(expired))
+
+    def unreachable(token):
+        raise AssertionError('verified again')
+    monkeypatch.setattr(auth, 'precheck_claims', unreachable)
+    response = client.get('/drinks-detail', headers=bearer(expired))
+    assert response.status_code == 401
+    assert response.get_json()['message'] == 'The token has expired .'
+
+
+def test_permission_masks():
+    registry = PermissionRegistry()
+    post = registry.register(['post:drinks'])
+    either = registry.register(['patch:drinks', 'delete:drinks'])
+    granted = registry.compile({'permissions': ['post:drinks', 'delete:drinks', 'unknown']})
+    assert check_permission_mask(granted, post, either)
+    with pytest.raises(AuthError):
+        check_permission_mask(registry.compile({'permissions': ['patch:drinks']}), post)
+    with pytest.raises(AuthError):
+        check_permission_mask(granted, 0, registry.register(['patch:drinks']))
+
+
+def test_roles(client, manager, barista):
+    assert client.get('/drinks-detail', headers=barista).status_code == 200
+    assert client.post('/drinks', json={'title': 'x', 'recipe': []}, headers=barista).status_code == 401
+    assert client.get('/drinks-detail').status_code == 401
+    assert client.delete('/drinks/1', headers=manager).status_code == 200
@@ -0,0 +1,67 @@
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+def titles(client):
+    return [drink['title'] for drink in client.get('/drinks').get_json()['drinks']]
+
+
+def errors(response):
+    assert response.status_code == 422
+    return [(error['index'], error['message']) for error in response.get_json()['errors']]
+
+
+def test_bulk_create_update_delete(client, manager):
+    response = client.post('/drinks/bulk', json={'drinks': [
+        {'title': 'a', 'recipe': RECIPE}, {'title': 'b', 'recipe': RECIPE[0]}
+    ]}, headers=manager)
+    created = response.get_json()['drinks']
+    assert [drink['title'] for drink in created] == ['a', 'b']
+    assert created[1]['recipe'] == RECIPE
+
+    response = client.patch('/drinks/bulk', json={'drinks': [
+        {'id': created[0]['id'], 'title': 'c'}, {'id': created[1]['id'], 'recipe': RECIPE * 2}
+    ]}, headers=manager)
+    assert [drink['title'] for drink in response.get_json()['drinks']] == ['c', 'b']
+    assert response.get_json()['drinks'][1]['recipe'] == RECIPE * 2
+
+    response = client.delete('/drinks/bulk', json={'ids': [created[0]['id'], created[1]['id']]}, headers=manager)
+    assert response.get_json()['delete'] == [created[0]['id'], created[1]['id']]
+    assert not {'a', 'b', 'c'} & set(titles(client))
+
+
+def test_bulk_create_is_all_or_nothing(client, manager):
+    before = titles(client)
+    response = client.post('/drinks/bulk', json={'drinks': [
+        {'title': 'new', 'recipe': RECIPE},
+        {'title': 'drink 0', 'recipe': RECIPE},
+        {'title': 'new', 'recipe': RECIPE},
+        {'title': 'bad', 'recipe': [{'name': 'x'}]}
+    ]}, headers=manager)
+    assert [index for index, _ in errors(response)] == [1, 2, 3]
+    assert errors(response)[:2] == [(1, 'a drink with this title already exists'), (2, 'title appears twice in the batch')]
+    assert titles(client) == before
+
+
+def test_bulk_update_errors(client, manager):
+    response = client.patch('/drinks/bulk', json={'drinks': [
+        {'id': 1, 'title': 'same'},
+        {'id': 2, 'title': 'same'},
+        {'id': 3, 'title': 'drink 4'},
+        {'id': 1, 'recipe': RECIPE},
+        {'id': 999, 'title': 'x'},
+        {'id': 4}
+    ]}, headers=manager)
+    assert errors(response) == [
+        (1, 'title appears twice in the batch'),
+        (2, 'a drink with this title already exists'),
+        (3, 'id appears twice in the batch'),
+        (4, 'drink not found'),
+        (5, 'nothing to update, give a title or a recipe')
+    ]
+
+
+def test_bulk_delete_errors(client, manager):
+    response = client.delete('/drinks/bulk', json={'ids': [1, 1, 999]}, headers=manager)
+    assert errors(response) == [(1, 'id appears twice in the batch'), (2, 'drink not found')]
+    assert errors(client.delete('/drinks/bulk', json={'ids': []}, headers=manager)) == [(None, 'expected a non-empty list')]
+    assert client.delete('/drinks/bulk', json={'ids': [1]}, headers={}).status_code == 401
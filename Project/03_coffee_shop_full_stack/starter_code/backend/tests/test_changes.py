@@ -0,0 +1,49 @@
+from src.database import models
+
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+def current_version(client):
+    return client.get('/drinks').get_json()['version']
+
+
+def test_changes_since_a_version(client, manager):
+    version = current_version(client)
+    new = client.post('/drinks', json={'title': 'new', 'recipe': RECIPE}, headers=manager).get_json()['recipe']['id']
+    client.patch('/drinks/1', json={'title': 'renamed'}, headers=manager)
+    client.delete('/drinks/2', headers=manager)
+
+    changes = client.get(f'/drinks/changes?since={version}').get_json()
+    assert changes['resync'] is False
+    assert changes['version'] == version + 3
+    assert sorted(drink['id'] for drink in changes['upserted']) == [1, new]
+    assert changes['deleted'] == [2]
+
+    unchanged = client.get(f"/drinks/changes?since={changes['version']}").get_json()
+    assert (unchanged['upserted'], unchanged['deleted']) == ([], [])
+
+
+def test_changes_need_a_version(client):
+    assert client.get('/drinks/changes').status_code == 400
+    assert client.get('/drinks/changes?since=-1').status_code == 400
+
+
+def test_resync_once_the_log_is_compacted(client, manager, monkeypatch):
+    monkeypatch.setattr(models, 'CHANGE_LOG_RETENTION', 2)
+    for title in ('a', 'b', 'c'):
+        client.post('/drinks', json={'title': title, 'recipe': RECIPE}, headers=manager)
+    changes = client.get('/drinks/changes?since=0').get_json()
+    assert changes['resync'] is True
+    assert changes['version'] == current_version(client)
+
+
+def test_resync_when_ahead_of_the_log(client):
+    changes = client.get('/drinks/changes?since=1000000').get_json()
+    assert changes['resync'] is True
+
+
+def test_resync_when_the_engine_does_not_order_commits(client, monkeypatch):
+    version = current_version(client)
+    monkeypatch.setattr(models, 'ORDERED_DIALECTS', ())
+    assert client.get('/drinks/changes?since=0').get_json()['resync'] is True
+    assert client.get(f'/drinks/changes?since={version}').get_json()['resync'] is False
@@ -0,0 +1,43 @@
+import gzip
+
+import pytest
+
+from src import compression
+from src.menu_cache import menu_cache
+
+
+@pytest.fixture(autouse=True)
+def compress_everything(monkeypatch):
+    # the seeded menu is smaller than COMPRESS_MIN_SIZE
+    monkeypatch.setattr(compression, 'COMPRESS_MIN_SIZE', 0)
+
+
+def test_listing_is_compressed_once_per_version(client):
+    plain = client.get('/drinks')
+    assert 'Content-Encoding' not in plain.headers
+    compressions = menu_cache.compressions
+    for _ in range(2):
+        response = client.get('/drinks', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.get_data()) == plain.get_data()
+        assert 'Accept-Encoding' in response.headers['Vary']
+    assert menu_cache.compressions == compressions + 1
+
+    # the compressed body carries the weak form of the listing's ETag
+    etag = response.headers['ETag']
+    assert etag == 'W/' + plain.headers['ETag']
+    assert client.get('/drinks', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+
+def test_other_responses_are_compressed_after_the_request(client):
+    plain = client.get('/drinks?limit=2')
+    response = client.get('/drinks?limit=2', headers={'Accept-Encoding': 'gzip;q=0.5, identity'})
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+def test_brotli_is_preferred(client):
+    brotli = pytest.importorskip('brotli')
+    plain = client.get('/drinks')
+    response = client.get('/drinks', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == plain.get_data()
@@ -0,0 +1,28 @@
+from src.menu_cache import menu_cache
+
+
+def test_matching_etag_gets_304(client, barista):
+    for path, headers in (('/drinks', {}), ('/drinks-detail', barista), ('/drinks?limit=2', {})):
+        first = client.get(path, headers=headers)
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        response = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert 'no-cache' in response.headers['Cache-Control']
+
+
+def test_stale_etag_gets_the_listing(client):
+    response = client.get('/drinks', headers={'If-None-Match': '"short-0"'})
+    assert response.status_code == 200
+    assert response.get_json()['drinks']
+
+
+def test_up_to_date_client_gets_304_without_a_build(client):
+    etag = client.get('/drinks').headers['ETag']
+    menu_cache.clear()
+    response = client.get('/drinks', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    # answered before the listing was built and cached again
+    assert menu_cache.stats()['size'] == 0
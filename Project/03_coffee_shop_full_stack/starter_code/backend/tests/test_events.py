@@ -0,0 +1,97 @@
+import time
+
+from src import api, broadcast
+
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+def current_version(client):
+    return client.get('/drinks').get_json()['version']
+
+
+def catch_up(client):
+    # brings the hub to the current version, as the feed thread would
+    with client.application.app_context():
+        api.change_feed.start()
+        api.change_feed.poll()
+        api.change_feed.poll()
+
+
+def read_events(response, count, timeout=5):
+    text = ''
+    deadline = time.time() + timeout
+    for chunk in response.response:
+        text += chunk.decode() if isinstance(chunk, bytes) else chunk
+        events = [
+            dict(line.split(': ', 1) for line in block.split('\n'))
+            for block in text.split('\n\n')
+            if block.startswith('id: ')
+        ]
+        if len(events) >= count or time.time() > deadline:
+            break
+    response.close()
+    return events
+
+
+def test_last_event_id_replays_what_was_missed(client, manager):
+    version = current_version(client)
+    new = client.post('/drinks', json={'title': 'new', 'recipe': RECIPE}, headers=manager).get_json()['recipe']['id']
+    client.patch('/drinks/1', json={'title': 'renamed'}, headers=manager)
+    client.delete('/drinks/2', headers=manager)
+    catch_up(client)
+
+    response = client.get('/drinks/stream', headers={'Last-Event-ID': str(version)}, buffered=False)
+    events = read_events(response, 3)
+    assert [(event['id'], event['event']) for event in events] == [
+        (str(version + 1), 'insert'),
+        (str(version + 2), 'update'),
+        (str(version + 3), 'delete')
+    ]
+    assert f'"id":{new}' in events[0]['data']
+    assert events[2]['data'] == '{"id":2}'
+
+
+def test_stream_without_last_event_id_starts_with_its_version(client):
+    catch_up(client)
+    events = read_events(client.get('/drinks/stream', buffered=False), 1)
+    assert events[0]['event'] == 'version'
+    assert events[0]['id'] == str(current_version(client))
+
+
+def test_last_event_id_ahead_of_the_log_resyncs(client):
+    catch_up(client)
+    response = client.get('/drinks/stream', headers={'Last-Event-ID': '1000000'}, buffered=False)
+    assert read_events(response, 1)[0]['event'] == 'resync'
+
+
+def test_hub_wakes_only_the_view_with_events():
+    hub = broadcast.BroadcastHub(max_queue=4)
+    short, _ = hub.subscribe('short')
+    long, _ = hub.subscribe('long')
+    hub.publish({'long': ['event']}, 1)
+    assert long.get(0) == ['event']
+    assert short.get(0.01) == []
+    assert hub.version == 1
+
+
+def test_hub_drops_slow_subscribers_and_refuses_extra_ones():
+    hub = broadcast.BroadcastHub(max_queue=2, max_subscribers=1)
+    slow, _ = hub.subscribe('short')
+    assert hub.subscribe('short')[0] is None
+    hub.publish({'short': ['a', 'b', 'c']}, 1)
+    assert slow.dropped and slow.get(0) == []
+    assert hub.stats()['refused'] == 1
+    assert hub.subscribe('short')[0] is not None
+
+
+def test_unopened_streams_are_unsubscribed(client, monkeypatch):
+    monkeypatch.setattr(api.event_hub, 'max_subscribers', 2)
+    subscribers = len(api.event_hub.subscribers)
+    for _ in range(3):
+        client.head('/drinks/stream').close()
+    # a client that goes away before the first event
+    client.get('/drinks/stream', buffered=False).close()
+    assert len(api.event_hub.subscribers) == subscribers
+    response = client.get('/drinks/stream', buffered=False)
+    assert response.status_code == 200
+    response.close()
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src import api
+from src.database import writer
+
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+@pytest.fixture
+def drink_writer(client):
+    # a wide window, so writes submitted together share a batch
+    return writer.GroupCommitWriter(client.application, window=0.2)
+
+
+def submit_together(drink_writer, calls):
+    results = [None] * len(calls)
+
+    def run(index, operation, *args):
+        try:
+            results[index] = drink_writer.submit(operation, *args)
+        except Exception as e:
+            results[index] = e
+    threads = [threading.Thread(target=run, args=(index,) + call) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_writes_share_a_commit(client, drink_writer):
+    results = submit_together(drink_writer, [(writer.insert_drink, f'new {i}', RECIPE) for i in range(8)])
+    assert sorted(result['title'] for result in results) == [f'new {i}' for i in range(8)]
+    assert drink_writer.stats()['writes'] == 8
+    assert drink_writer.stats()['batches'] < 8
+    titles = [drink['title'] for drink in client.get('/drinks').get_json()['drinks']]
+    assert {f'new {i}' for i in range(8)} <= set(titles)
+
+
+def test_a_failed_write_reaches_only_its_caller(client, drink_writer):
+    results = submit_together(drink_writer, [
+        (writer.insert_drink, 'ok', RECIPE),
+        (writer.insert_drink, 'drink 0', RECIPE),
+        (writer.delete_drink, 999),
+        (writer.update_drink, 2, 'renamed', None)
+    ])
+    assert results[0]['title'] == 'ok'
+    assert isinstance(results[1], IntegrityError)
+    assert isinstance(results[2], LookupError)
+    assert results[3]['title'] == 'renamed'
+    titles = [drink['title'] for drink in client.get('/drinks').get_json()['drinks']]
+    assert 'ok' in titles and 'renamed' in titles
+
+
+def test_api_writes_through_the_group_writer(client, manager, drink_writer, monkeypatch):
+    monkeypatch.setattr(api, 'drink_writer', drink_writer)
+    assert client.post('/drinks', json={'title': 'grouped', 'recipe': RECIPE}, headers=manager).status_code == 200
+    assert client.delete('/drinks/999', headers=manager).status_code == 422
+    assert drink_writer.stats()['writes'] == 2
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from src.database.models import Drink, Ingredient, db, insert_ingredients
+
+RECIPE = [{'name': 'oat milk', 'color': 'white', 'parts': 2}, {'name': 'cardamom', 'color': 'green', 'parts': 1}]
+
+
+def recipes(client, headers):
+    return {drink['id']: drink['recipe'] for drink in client.get('/drinks-detail', headers=headers).get_json()['drinks']}
+
+
+def test_ingredient_filter_and_counts(client, barista):
+    drinks = recipes(client, barista)
+    counts = Counter(name for recipe in drinks.values() for name in {r['name'] for r in recipe})
+    ingredients = client.get('/ingredients', headers=barista).get_json()['ingredients']
+    assert {i['name']: i['drinks'] for i in ingredients} == counts
+    assert [i['drinks'] for i in ingredients] == sorted(counts.values(), reverse=True)
+
+    name = ingredients[0]['name']
+    filtered = client.get('/drinks?ingredient=' + name).get_json()['drinks']
+    assert [drink['id'] for drink in filtered] == [i for i, recipe in drinks.items() if name in {r['name'] for r in recipe}]
+    assert client.get('/drinks?ingredient=nothing').get_json()['drinks'] == []
+
+
+def test_ingredients_follow_recipe_changes(client, manager):
+    drink = client.post('/drinks', json={'title': 'flat white', 'recipe': RECIPE}, headers=manager).get_json()['recipe']
+    assert [d['title'] for d in client.get('/drinks?ingredient=cardamom').get_json()['drinks']] == ['flat white']
+    client.patch(f'/drinks/{drink["id"]}', json={'title': 'flat white', 'recipe': RECIPE[:1]}, headers=manager)
+    assert client.get('/drinks?ingredient=cardamom').get_json()['drinks'] == []
+
+
+def test_setting_a_recipe_leaves_the_database_alone(client):
+    with client.application.app_context():
+        Drink(title='unsaved', recipe=[{'name': 'saffron', 'color': 'gold', 'parts': 1}])
+        assert not db.session.new
+        assert Ingredient.query.filter_by(name='saffron').one_or_none() is None
+
+
+def test_insert_ingredients_skips_existing_names(client):
+    with client.application.app_context():
+        existing = {i.name for i in Ingredient.query}
+        # another request inserted them meanwhile
+        insert_ingredients(existing | {'saffron'})
+        db.session.commit()
+        names = [i.name for i in Ingredient.query]
+    assert sorted(names) == sorted(existing | {'saffron'})
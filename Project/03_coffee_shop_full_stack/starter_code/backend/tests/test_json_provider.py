@@ -0,0 +1,43 @@
+import pytest
+from flask import request
+from werkzeug.exceptions import BadRequest
+
+from src import json_provider
+
+
+@pytest.fixture(params=['json', 'orjson'])
+def provider(request):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    previous = json_provider.provider
+    yield json_provider.use(request.param)
+    json_provider.provider = previous
+
+
+def test_get_json(client, provider):
+    app = client.application
+    with app.test_request_context(data='{"b": [1, 2.5], "a": "caf\\u00e9"}', content_type='application/json'):
+        body = request.get_json()
+        assert body == {'a': 'café', 'b': [1, 2.5]}
+        # decoded once per request
+        assert request.get_json() is body
+    with app.test_request_context(data='{"a": 1}', content_type='text/plain'):
+        assert request.get_json() is None
+        assert request.get_json(force=True) == {'a': 1}
+    with app.test_request_context(data='{"a":', content_type='application/json'):
+        assert request.get_json(silent=True) is None
+        with pytest.raises(BadRequest):
+            request.get_json()
+
+
+def test_jsonify(client, provider):
+    with client.application.app_context():
+        response = json_provider.jsonify({'b': 1, 'a': [None, True, 'x']})
+    # compact with sorted keys, like Flask's jsonify
+    assert response.get_data() == b'{"a":[null,true,"x"],"b":1}\n'
+    assert response.mimetype == 'application/json'
+
+
+def test_malformed_body_is_a_400(client, manager, provider):
+    response = client.post('/drinks', data='{"title":', content_type='application/json', headers=manager)
+    assert response.status_code == 400
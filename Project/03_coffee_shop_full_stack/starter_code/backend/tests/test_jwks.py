@@ -0,0 +1,41 @@
+import time
+
+from src.auth.jwks import JWKSCache, cache_lifetime
+
+KEY = {'kty': 'RSA', 'kid': 'kid-1', 'use': 'sig', 'n': 'n', 'e': 'AQAB'}
+
+
+class StubCache(JWKSCache):
+    def __init__(self, lifetime, **kwargs):
+        super().__init__('http://unused', background=False, **kwargs)
+        self.lifetime = lifetime
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return {'kid-1': KEY}, self.lifetime
+
+
+def test_lifetime_honours_max_age_up_to_ttl():
+    assert cache_lifetime('public, max-age=30', 600) == 30
+    assert cache_lifetime('max-age=86400', 600) == 600
+    assert cache_lifetime('no-cache', 600) == 0
+    assert cache_lifetime(None, 600) == 600
+
+
+def test_keys_are_fetched_once_until_they_expire():
+    cache = StubCache(0.05, min_refresh_interval=3600)
+    assert cache.get('kid-1') == KEY
+    assert cache.get('kid-1') == KEY
+    assert cache.fetches == 1
+    time.sleep(0.1)
+    cache.get('kid-1')
+    assert cache.fetches == 2
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval():
+    cache = StubCache(600, min_refresh_interval=3600)
+    cache.get('kid-1')
+    assert cache.get('rotated') is None
+    assert cache.get('rotated') is None
+    assert cache.fetches == 1
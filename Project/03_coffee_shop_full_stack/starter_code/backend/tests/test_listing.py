@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src import api
+from src.api import decode_cursor, encode_cursor
+from src.single_flight import SingleFlight
+
+
+@pytest.mark.parametrize('drink_id', [0, 1, 42, 10 ** 12])
+def test_cursor_round_trip(drink_id):
+    cursor = encode_cursor(drink_id)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == drink_id
+
+
+def test_pages_cover_the_listing_once(client):
+    listing = [drink['id'] for drink in client.get('/drinks').get_json()['drinks']]
+    seen = []
+    cursor = ''
+    while True:
+        page = client.get(f'/drinks?limit=2&cursor={cursor}').get_json()
+        seen += [drink['id'] for drink in page['drinks']]
+        cursor = page['next']
+        if cursor is None:
+            break
+    assert seen == listing
+    assert len(seen) > 2
+
+
+def test_title_prefix(client):
+    page = client.get('/drinks?title=drink%201').get_json()
+    assert [drink['title'] for drink in page['drinks']] == ['drink 1']
+    assert page['next'] is None
+    assert client.get('/drinks?title=none').get_json()['drinks'] == []
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=x', 'cursor=%%%', 'cursor=LTE'])
+def test_bad_page_params(client, query):
+    assert client.get('/drinks?' + query).status_code == 400
+
+
+def test_stream_returns_the_whole_listing(client, barista, monkeypatch):
+    # several batches for the seeded drinks
+    monkeypatch.setattr(api, 'STREAM_BATCH_SIZE', 2)
+    listing = client.get('/drinks-detail', headers=barista).get_json()['drinks']
+    streamed = client.get('/drinks-detail?stream=1', headers=barista)
+    assert streamed.is_streamed
+    assert json.loads(streamed.get_data())['drinks'] == listing
+    lines = client.get('/drinks-detail?stream=ndjson', headers=barista).get_data().splitlines()
+    assert [json.loads(line) for line in lines] == listing
+
+
+@pytest.mark.parametrize('query', ['stream=0', 'stream=true', 'stream=', 'stream=1&limit=2', 'stream=ndjson&title=d'])
+def test_bad_stream_params(client, query):
+    assert client.get('/drinks?' + query).status_code == 400
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'body'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do('key', build)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do('key', build))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while flights.stats()['followers'] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+    assert results == ['body'] * 4
+    assert len(calls) == 1
+    # nothing is kept once the leader is done
+    assert flights.do('key', lambda: 'again') == 'again'
+
+
+def test_single_flight_raises_and_forgets_the_error():
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do('key', lambda: int('x'))
+    assert flights.stats()['in_flight'] == 0
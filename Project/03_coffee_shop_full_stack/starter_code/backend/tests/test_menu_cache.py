@@ -0,0 +1,57 @@
+import sqlite3
+
+from src.database.models import db
+from src.menu_cache import MenuCache, menu_cache
+
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+def test_menu_cache_serves_only_the_current_version():
+    cache = MenuCache()
+    body, etag = cache.set('short', 1, b'{"drinks":[]}')
+    assert cache.get('short', 1) == (body, etag)
+    assert cache.get('short', 2) is None
+    # a body built from an older menu never replaces a newer one
+    cache.set('short', 3, b'new')
+    cache.set('short', 2, b'old')
+    assert cache.get('short', 3)[0] == b'new'
+
+
+def test_menu_cache_compresses_each_variant_once():
+    cache = MenuCache()
+    cache.set('long', 1, b'body')
+    calls = []
+    compress = lambda body: calls.append(body) or body[::-1]
+    assert cache.variant('long', 1, 'gzip', compress) == b'ydob'
+    assert cache.variant('long', 1, 'gzip', compress) == b'ydob'
+    assert calls == [b'body']
+    assert cache.variant('long', 2, 'gzip', compress) is None
+
+
+def test_listing_is_cached_until_a_drink_changes(client, manager):
+    first = client.get('/drinks')
+    hits = menu_cache.hits
+    assert client.get('/drinks').get_data() == first.get_data()
+    assert menu_cache.hits == hits + 1
+
+    response = client.post('/drinks', json={'title': 'new', 'recipe': RECIPE}, headers=manager)
+    assert response.status_code == 200
+    second = client.get('/drinks')
+    assert 'new' in [drink['title'] for drink in second.get_json()['drinks']]
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_listing_sees_commits_of_other_processes(client):
+    first = client.get('/drinks')
+    # another worker process renames a drink, this one's cache is stale
+    with client.application.app_context():
+        path = db.engine.url.database
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE drink SET title = 'renamed' WHERE id = 1")
+        connection.execute("INSERT INTO drink_changes (drink_id, operation) VALUES (1, 'update')")
+    connection.close()
+
+    response = client.get('/drinks', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert 'renamed' in [drink['title'] for drink in response.get_json()['drinks']]
@@ -0,0 +1,44 @@
+import json
+
+from sqlalchemy import text
+
+from src.database.models import DrinkIngredient, db, migrate_changes, migrate_ingredients, migrate_recipes
+
+
+def legacy_database(app, *recipes):
+    # the drink table as it was while recipes were a plain String blob
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.execute(text('CREATE TABLE drink (id INTEGER PRIMARY KEY, title VARCHAR(80) UNIQUE, recipe VARCHAR(180) NOT NULL)'))
+            for i, recipe in enumerate(recipes):
+                connection.execute(text('INSERT INTO drink (title, recipe) VALUES (:title, :recipe)'),
+                                   {'title': f'legacy {i}', 'recipe': json.dumps(recipe)})
+
+
+def test_migrate_recipes(client):
+    latte = {'name': 'milk', 'color': 'white', 'parts': 2}
+    legacy_database(client.application, latte, [latte, {'name': 'coffee', 'color': 'brown', 'parts': 1}])
+    with client.application.app_context():
+        migrate_recipes()
+        # a second run finds the column and does nothing
+        migrate_recipes()
+        rows = db.session.execute(text('SELECT recipe, recipe_short FROM drink ORDER BY id')).fetchall()
+    assert [json.loads(recipe) for recipe, _ in rows][0] == [latte]
+    assert [json.loads(short) for _, short in rows] == [
+        [{'color': 'white', 'parts': 2}],
+        [{'color': 'white', 'parts': 2}, {'color': 'brown', 'parts': 1}]
+    ]
+
+
+def test_migrate_ingredients(client):
+    legacy_database(client.application, [{'name': 'milk', 'color': 'white', 'parts': 2}],
+                    [{'name': 'coffee', 'color': 'brown', 'parts': 1}, {'name': 'milk', 'color': 'white', 'parts': 1}])
+    with client.application.app_context():
+        migrate_recipes()
+        migrate_changes()
+        migrate_ingredients()
+        rows = [(row.drink_id, row.position, row.ingredient.name, row.parts)
+                for row in DrinkIngredient.query.order_by(DrinkIngredient.drink_id, DrinkIngredient.position)]
+    assert rows == [(1, 0, 'milk', 2), (2, 0, 'coffee', 1), (2, 1, 'milk', 1)]
+    assert [d['title'] for d in client.get('/drinks?ingredient=coffee').get_json()['drinks']] == ['legacy 1']
@@ -0,0 +1,40 @@
+import time
+
+from src.auth import auth
+from src.auth.token_cache import TokenCache
+
+
+def test_entry_expires_at_the_token_exp():
+    cache = TokenCache(max_size=4, max_ttl=300)
+    cache.set('a', 'payload', time.time() + 0.05)
+    assert cache.get('a') == 'payload'
+    time.sleep(0.1)
+    assert cache.get('a') is None
+
+
+def test_entry_expires_after_max_ttl():
+    cache = TokenCache(max_size=4, max_ttl=0.05)
+    cache.set('a', 'payload', time.time() + 3600)
+    time.sleep(0.1)
+    assert cache.get('a') is None
+
+
+def test_expired_tokens_are_not_stored_and_lru_is_evicted():
+    cache = TokenCache(max_size=2, max_ttl=300)
+    cache.set('expired', 'payload', time.time() - 1)
+    assert cache.get('expired') is None
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_verified_tokens_are_served_from_the_cache(client, mint):
+    headers = {'Authorization': 'Bearer ' + mint('barista')}
+    client.get('/drinks-detail', headers=headers)
+    hits = auth.token_cache.stats()['hits']
+    assert client.get('/drinks-detail', headers=headers).status_code == 200
+    assert auth.token_cache.stats()['hits'] == hits + 1
@@ -0,0 +1,130 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from jose import jwt
+from jose.utils import base64url_encode
+
+from src.auth.local_issuer import LocalIssuer
+from src.auth.verification import VerifierPool, VerifierUnavailable, decode_token, get_verifier, verify_signature
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def issuer():
+    issuer = LocalIssuer().start()
+    yield issuer
+    issuer.stop()
+
+
+@pytest.fixture
+def pool():
+    pool = VerifierPool(processes=1, timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+def decode(pool, issuer, token, algorithms=('RS256',)):
+    key = issuer.jwks()['keys'][0]
+    return pool.decode(token, key, list(algorithms), issuer.audience, issuer.issuer)
+
+
+def test_pool_verifies_tokens(pool, issuer):
+    assert decode(pool, issuer, issuer.mint('barista'))['sub'] == 'local|barista'
+    with pytest.raises(jwt.JWTError):
+        decode(pool, issuer, issuer.mint('barista'), algorithms=('ES256',))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode(pool, issuer, issuer.mint('barista', expires_in=-10))
+
+
+def test_pool_replaces_dead_workers(pool, issuer):
+    decode(pool, issuer, issuer.mint('barista'))
+    for process in list(pool._executor._processes.values()):
+        process.kill()
+        process.join()
+    # the request that finds the pool broken may fail, later ones succeed
+    try:
+        decode(pool, issuer, issuer.mint('barista'))
+    except VerifierUnavailable:
+        pass
+    assert decode(pool, issuer, issuer.mint('manager'))['sub'] == 'local|manager'
+
+
+def test_pool_times_out(pool, issuer):
+    pool.timeout = 0.000001
+    with pytest.raises(VerifierUnavailable):
+        decode(pool, issuer, issuer.mint('barista'))
+
+
+def test_pool_restarts_after_shutdown(pool, issuer):
+    decode(pool, issuer, issuer.mint('barista'))
+    pool.shutdown()
+    assert pool._executor is None
+    assert decode(pool, issuer, issuer.mint('barista'))['sub'] == 'local|barista'
+
+
+def test_process_exits_after_shutdown():
+    script = textwrap.dedent('''
+        from src.auth.local_issuer import LocalIssuer
+        from src.auth.verification import VerifierPool
+
+        if __name__ == '__main__':
+            issuer = LocalIssuer().start()
+            pool = VerifierPool(processes=2)
+            pool.decode(issuer.mint('barista'), issuer.jwks()['keys'][0], ['RS256'], issuer.audience, issuer.issuer)
+            pool.shutdown()
+            issuer.stop()
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND, timeout=60,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == ''
+
+
+def tampered(token):
+    head, payload, signature = token.split('.')
+    return '.'.join((head, payload, ('A' if signature[0] != 'A' else 'B') + signature[1:]))
+
+
+@pytest.mark.parametrize('name', ['jose', 'cryptography'])
+def test_verifiers_check_rsa_signatures(issuer, name):
+    if name == 'cryptography':
+        pytest.importorskip('cryptography')
+    verifier = get_verifier(name)
+    key = issuer.jwks()['keys'][0]
+    public_key = verifier.construct_key(key, 'RS256')
+    token = issuer.mint('barista')
+    claims = decode_token(token, key, public_key, ['RS256'], issuer.audience, issuer.issuer, verifier)
+    assert claims['sub'] == 'local|barista'
+    with pytest.raises(jwt.JWTError):
+        verify_signature(tampered(token), public_key, verifier)
+
+
+def test_cryptography_verifies_ec_signatures():
+    pytest.importorskip('cryptography')
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    numbers = private_key.public_key().public_numbers()
+    key = {
+        'kty': 'EC', 'kid': 'ec-1', 'crv': 'P-256',
+        'x': base64url_encode(numbers.x.to_bytes(32, 'big')).decode('ascii'),
+        'y': base64url_encode(numbers.y.to_bytes(32, 'big')).decode('ascii')
+    }
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    token = jwt.encode({'sub': 'ec'}, pem.decode('ascii'), algorithm='ES256')
+    verifier = get_verifier('cryptography')
+    public_key = verifier.construct_key(key, 'ES256')
+    verify_signature(token, public_key, verifier)
+    with pytest.raises(jwt.JWTError):
+        verify_signature(tampered(token), public_key, verifier)
+
+
+def test_unknown_verifier():
+    with pytest.raises(ValueError):
+        get_verifier('nope')
@@ -19,7 +19,8 @@ export class DrinkMenuPage implements OnInit {
     ) { }
 
   ngOnInit() {
-    this.drinks.getDrinks();
+    // downloads the menu the first time, then only what changed since
+    this.drinks.syncDrinks();
   }
 
   async openForm(activedrink: Drink = null) {
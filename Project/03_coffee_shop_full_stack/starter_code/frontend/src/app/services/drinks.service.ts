@@ -22,6 +22,8 @@ export class DrinksService {
   url = environment.apiServerUrl;
 
   public items: {[key: number]: Drink} = {};
+  // sync version of items, see syncDrinks()
+  public version = 0;
   // = {
   //                             1: {
   //                             id: 1,
@@ -95,18 +97,43 @@ export class DrinksService {
       this.http.get(this.url + '/drinks-detail', this.getHeaders())
       .subscribe((res: any) => {
         this.drinksToItems(res.drinks);
+        this.version = res.version;
         console.log(res);
       });
     } else {
       this.http.get(this.url + '/drinks', this.getHeaders())
       .subscribe((res: any) => {
         this.drinksToItems(res.drinks);
+        this.version = res.version;
         console.log(res);
       });
     }
 
   }
 
+  // applies the changes made since the last sync instead of downloading the
+  // whole menu, or downloads it when the server no longer has them
+  syncDrinks() {
+    if (!this.version) {
+      this.getDrinks();
+      return;
+    }
+    const path = this.auth.can('get:drinks-detail') ? '/drinks-detail/changes' : '/drinks/changes';
+    this.http.get(this.url + path + '?since=' + this.version, this.getHeaders())
+    .subscribe((res: any) => {
+      if (res.resync) {
+        this.items = {};
+        this.getDrinks();
+        return;
+      }
+      this.drinksToItems(res.upserted);
+      for (const id of res.deleted) {
+        delete this.items[id];
+      }
+      this.version = res.version;
+    });
+  }
+
   saveDrink(drink: Drink) {
     if (drink.id >= 0) { // patch
       this.http.patch(this.url + '/drinks/' + drink.id, drink, this.getHeaders())
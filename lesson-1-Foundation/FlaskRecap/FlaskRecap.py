@@ -1,8 +1,51 @@
 #!/usr/bin/python
 # -*- coding: iso-8859-15 -*-
-from flask import Flask, request, jsonify, abort
+import json
+import os
+from flask import Flask, Request, request, abort, current_app
+
+# responses and request bodies are encoded by orjson when it is installed,
+# JSON_PROVIDER=json keeps the standard library, JSON_PROVIDER=orjson requires orjson
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+orjson = None
+if JSON_PROVIDER != 'json':
+    try:
+        import orjson
+    except ImportError:
+        if JSON_PROVIDER == 'orjson':
+            raise
+
+
+def json_dumpb(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def jsonify(data):
+    return current_app.response_class(json_dumpb(data) + b'\n', mimetype='application/json')
+
+
+class JSONRequest(Request):
+    def get_json(self, force=False, silent=False, cache=True):
+        if not (force or self.is_json):
+            return None
+        try:
+            return json_loads(self.get_data(cache=cache))
+        except ValueError as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+
 
 app = Flask(__name__)
+app.request_class = JSONRequest
 
 greetings = {
             'en': 'hello', 
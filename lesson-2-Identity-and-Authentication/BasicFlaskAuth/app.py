@@ -1,15 +1,143 @@
 from flask import Flask, request, abort
 import json
+import os
+import re
+import threading
+import time
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen
 
+# the JWKS is decoded by orjson when it is installed, JSON_PROVIDER=json
+# keeps the standard library, JSON_PROVIDER=orjson requires orjson
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+orjson = None
+if JSON_PROVIDER != 'json':
+    try:
+        import orjson
+    except ImportError:
+        if JSON_PROVIDER == 'orjson':
+            raise
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 app = Flask(__name__)
 
-AUTH0_DOMAIN = 'dev-k32g9c32.us.auth0.com'
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'dev-k32g9c32.us.auth0.com')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = 'image'
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'image')
+# set AUTH0_ISSUER to a local issuer (see the coffee shop backend's
+# src/auth/local_issuer.py) to run without the Auth0 tenant
+AUTH0_ISSUER = os.environ.get('AUTH0_ISSUER', 'https://' + AUTH0_DOMAIN + '/')
+JWKS_URL = os.environ.get('JWKS_URL', AUTH0_ISSUER + '.well-known/jwks.json')
+JWKS_CACHE_TTL = 600
+JWKS_REFRESH_AHEAD = 60
+JWKS_MIN_REFRESH_INTERVAL = 10
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+def cache_lifetime(cache_control, ttl):
+    """Seconds a JWKS response may be cached: its max-age, at most ttl."""
+    cache_control = (cache_control or '').lower()
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        return min(int(match.group(1)), ttl)
+    return ttl
+
+
+class JWKSCache:
+    """Keeps the issuer's signing keys by kid and renews them in the background.
+
+    The last good key set is served while the issuer is slow or down, and
+    concurrent refreshes (cold start, unknown kid) share a single fetch.
+    Keys are kept for the response's Cache-Control max-age, at most
+    JWKS_CACHE_TTL seconds; stop_refresher() ends the background thread.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.keys = {}
+        self.expires_at = 0
+        self.last_refresh = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                self._inflight = threading.Event()
+
+        if inflight is not None:
+            inflight.wait(6)
+            if not self.keys and self.last_error is not None:
+                raise self.last_error
+            return
+
+        try:
+            response = urlopen(self.url, timeout=5)
+            jwks = json_loads(response.read())
+            self.keys = {key['kid']: key for key in jwks['keys'] if 'kid' in key}
+            lifetime = cache_lifetime(response.headers.get('Cache-Control'), JWKS_CACHE_TTL)
+            self.expires_at = time.monotonic() + lifetime
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            self.expires_at = time.monotonic() + JWKS_MIN_REFRESH_INTERVAL
+            if not self.keys:
+                raise
+        finally:
+            self.last_refresh = time.monotonic()
+            with self._lock:
+                inflight, self._inflight = self._inflight, None
+            inflight.set()
+
+    def get(self, kid):
+        self.start_refresher()
+        if not self.keys:
+            self.refresh()
+        key = self.keys.get(kid)
+        if key is None and time.monotonic() - self.last_refresh >= JWKS_MIN_REFRESH_INTERVAL:
+            self.refresh()
+            key = self.keys.get(kid)
+        return key
+
+    def start_refresher(self):
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._stop.clear()
+            threading.Thread(target=self._run_refresher, name='jwks-refresher', daemon=True).start()
+
+    def stop_refresher(self):
+        self._stop.set()
+        self._refresher_pid = None
+
+    def _run_refresher(self):
+        while not self._stop.is_set():
+            delay = self.expires_at - JWKS_REFRESH_AHEAD - time.monotonic()
+            if self._stop.wait(max(delay, JWKS_MIN_REFRESH_INTERVAL)):
+                return
+            try:
+                self.refresh()
+            except Exception:
+                pass
+
+
+jwks_cache = JWKSCache(JWKS_URL)
 
 
 class AuthError(Exception):
@@ -52,8 +180,6 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
     rsa_key = {}
     if 'kid' not in unverified_header:
@@ -62,15 +188,15 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    key = jwks_cache.get(unverified_header['kid'])
+    if key:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -78,7 +204,7 @@ def verify_decode_jwt(token):
                 rsa_key,
                 algorithms=ALGORITHMS,
                 audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
+                issuer=AUTH0_ISSUER
             )
 
             return payload